@@ -0,0 +1,59 @@
+"""Cost of snapshotting the chat history for one request, as the history grows.
+
+The snapshot copies references, it grows with the number of messages but not
+with their size; deepcopy and ChatContext.copy() copy every message and frame.
+
+    python benchmarks/bench_chat_snapshot.py
+"""
+
+import copy
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+from livekit import rtc  # noqa: E402
+from livekit.agents.llm import ChatContext, ChatImage, ChatMessage, ChatRole  # noqa: E402
+
+from context_window import SnapshotChatContext  # noqa: E402
+
+SYSTEM_PROMPT = "Vous êtes un assistant drôle et serviable. " * 400
+TURN = "Quand et où se déroule le Digital Leaders Summit ? " * 3
+IMAGE_EVERY = 10  # one vision turn every IMAGE_EVERY messages
+
+
+def _history(cls, size: int):
+    messages = [ChatMessage(role=ChatRole.SYSTEM, text=SYSTEM_PROMPT)]
+    for i in range(size):
+        images = []
+        if i % IMAGE_EVERY == 0:
+            image = rtc.VideoFrame(
+                640, 480, rtc.VideoBufferType.RGBA, bytes(640 * 480 * 4)
+            )
+            images.append(ChatImage(image=image))
+
+        role = ChatRole.USER if i % 2 == 0 else ChatRole.ASSISTANT
+        messages.append(ChatMessage(role=role, text=TURN, images=images))
+
+    return cls(messages=messages)
+
+
+def _time_us(fnc, number: int) -> float:
+    return min(timeit.repeat(fnc, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    print(f"{'messages':>8} {'deepcopy':>12} {'ChatContext.copy':>18} {'snapshot':>10}")
+    for size in (10, 50, 200, 1000):
+        plain = _history(ChatContext, size)
+        shared = _history(SnapshotChatContext, size)
+        number = max(1, 2000 // size)
+        deep = _time_us(lambda: copy.deepcopy(plain), max(1, number // 20))
+        copied = _time_us(plain.copy, number)
+        snap = _time_us(shared.copy, number * 10)
+        print(f"{size:>8} {deep:>10.1f}us {copied:>16.1f}us {snap:>8.2f}us")
+
+
+if __name__ == "__main__":
+    main()
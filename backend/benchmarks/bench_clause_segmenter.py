@@ -0,0 +1,127 @@
+"""Time to first audio of the basic sentence tokenizer vs the clause segmenter.
+
+Replays LLM token streams through both tokenizers and models the TTS latency
+of the first chunk (non streamed OpenAI TTS: a fixed cost plus a cost per
+character). Recorded streams can be given as JSON lines:
+
+    {"language": "fr", "tokens": [[412, "Le"], [440, " Digital"], ...]}
+
+where each token comes with its arrival time in ms since the request.
+
+    python benchmarks/bench_clause_segmenter.py [--streams recorded.jsonl]
+"""
+
+import argparse
+import json
+import pathlib
+import re
+import statistics
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+from livekit.agents.tokenize import TokenEventType, basic  # noqa: E402
+
+from segmenter import ClauseTokenizer  # noqa: E402
+
+SAMPLE_REPLIES = [
+    (
+        "fr",
+        "Le Digital Leaders Summit se déroulera le 12 juin au Palais Brongniart, à "
+        "Paris, et réunira plus de 1 500 dirigeants autour des enjeux de "
+        "l'intelligence artificielle et de la transformation numérique. La journée "
+        "commencera à 9 h 30 par une plénière animée par M. Dupont.",
+    ),
+    (
+        "fr",
+        "Bien sûr, je peux vous aider à trouver votre salle : la conférence sur la "
+        "cybersécurité a lieu au premier étage, dans l'amphithéâtre B, juste après "
+        "l'escalier principal, et elle commence dans une quinzaine de minutes.",
+    ),
+    (
+        "fr",
+        "Pour les frelons asiatiques, nous intervenons généralement sous 48 heures "
+        "dans toute la région, avec une perche télescopique qui nous permet "
+        "d'atteindre les nids jusqu'à 30 mètres de hauteur, etc. Le tarif dépend "
+        "de la hauteur du nid.",
+    ),
+    (
+        "es",
+        "Claro, el restaurante del hotel abre a las 7:30 para el desayuno, y por la "
+        "noche ofrece un menú degustación de cinco platos, aunque le recomiendo "
+        "reservar con antelación porque suele llenarse los fines de semana.",
+    ),
+    (
+        "en",
+        "With pocket kings on the button and two limpers in front of you, raising "
+        "to around five big blinds is usually the best play, because you want to "
+        "isolate the weaker hands and build a pot while you are ahead.",
+    ),
+]
+
+
+def synthetic_stream(text: str, ttft_ms: float, token_ms: float):
+    # roughly one token per word, good enough for French and Spanish
+    pieces = re.findall(r"\s*\S+", text)
+    return [(ttft_ms + i * token_ms, piece) for i, piece in enumerate(pieces)]
+
+
+def first_chunk(tokenizer, language: str, tokens):
+    """Arrival time of the token that released the first chunk, and that chunk."""
+    stream = tokenizer.stream(language=language)
+    for at, text in tokens:
+        stream.push_text(text)
+        while not stream._event_queue.empty():
+            event = stream._event_queue.get_nowait()
+            if event is not None and event.type == TokenEventType.TOKEN:
+                return at, event.token
+
+    stream.push_text(None)
+    while not stream._event_queue.empty():
+        event = stream._event_queue.get_nowait()
+        if event is not None and event.type == TokenEventType.TOKEN:
+            return tokens[-1][0], event.token
+
+    return tokens[-1][0], ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=pathlib.Path)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--token-ms", type=float, default=35.0)
+    parser.add_argument("--tts-base-ms", type=float, default=250.0)
+    parser.add_argument("--tts-ms-per-char", type=float, default=3.0)
+    args = parser.parse_args()
+
+    if args.streams:
+        streams = []
+        for line in args.streams.read_text().splitlines():
+            if line.strip():
+                data = json.loads(line)
+                streams.append((data["language"], data["tokens"]))
+    else:
+        streams = [
+            (language, synthetic_stream(text, args.ttft_ms, args.token_ms))
+            for language, text in SAMPLE_REPLIES
+        ]
+
+    tokenizers = {
+        "basic": lambda language: basic.SentenceTokenizer(),
+        "clause": lambda language: ClauseTokenizer(language=language),
+    }
+    for name, make in tokenizers.items():
+        ttfa = []
+        for language, tokens in streams:
+            at, chunk = first_chunk(make(language), language, tokens)
+            ttfa.append(at + args.tts_base_ms + args.tts_ms_per_char * len(chunk))
+            print(f"  {name:<6} {language} {at:6.0f}ms  {chunk[:70]!r}")
+
+        print(
+            f"{name:<6} time to first audio: mean {statistics.mean(ttfa):6.0f}ms"
+            f"  max {max(ttfa):6.0f}ms\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
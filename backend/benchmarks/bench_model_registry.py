@@ -0,0 +1,63 @@
+"""Per-session VAD setup cost, with and without the process-wide model registry.
+
+    python benchmarks/bench_model_registry.py --sessions 20
+"""
+
+import argparse
+import gc
+import pathlib
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+from livekit.plugins import silero  # noqa: E402
+
+from models import ModelRegistry  # noqa: E402
+
+
+def _rss_mb() -> float:
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def _measure(name: str, create_vad, sessions: int) -> None:
+    gc.collect()
+    rss_before = _rss_mb()
+    vads = []
+    timings = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        vads.append(create_vad())
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    rss_per_session = (_rss_mb() - rss_before) / sessions
+    timings.sort()
+    print(
+        f"{name:<14} setup mean {sum(timings) / sessions * 1000:8.2f}ms"
+        f"  p95 {timings[int(sessions * 0.95) - 1] * 1000:8.2f}ms"
+        f"  memory/session {rss_per_session:7.2f}MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    args = parser.parse_args()
+
+    # download/warm the torch hub cache so both runs measure loading only
+    silero.VAD()
+
+    registry = ModelRegistry()
+    start = time.perf_counter()
+    registry.load()
+    print(f"registry load (once per worker) {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    _measure("with registry", registry.vad, args.sessions)
+    _measure("silero.VAD()", silero.VAD, args.sessions)
+
+
+if __name__ == "__main__":
+    main()
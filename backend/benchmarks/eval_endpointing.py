@@ -0,0 +1,210 @@
+"""Offline evaluation of end-of-turn detection: fixed silence delays vs adaptive.
+
+Runs silero over recorded calls (16kHz mono 16 bits WAV), replays the speech
+probabilities through the same end-of-speech logic as the silero stream and
+reports, for each setting, the latency between the real end of a turn and
+its detection, and the false cut-offs (turn ended while the user was still
+talking).
+
+Each recording can come with a <name>.json next to it:
+
+    {"turn_ends": [4.1, 9.8], "words": [[0.4, "bonjour"], [0.9, "je"], ...]}
+
+turn_ends are the times (s) the user really finished a turn, words the end
+time of every transcribed word, used for the transcript cues. Without it the
+whole recording is one turn, ending with the last speech.
+
+    python benchmarks/eval_endpointing.py recordings/ --language fr
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import sys
+import wave
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+from livekit.agents import utils, vad  # noqa: E402
+
+from endpointing import (  # noqa: E402
+    Endpointer,
+    EndpointingPolicy,
+    _AdaptiveVADStream,
+)
+
+SAMPLE_RATE = 16000
+WINDOW = 640  # 40ms, as the silero stream
+THRESHOLD = 0.2
+MIN_SPEAKING = 0.2
+FIXED_DELAYS = (0.4, 0.6, 0.8, 1.0, 1.2, 1.6)
+
+
+def speech_probabilities(path: pathlib.Path, model) -> np.ndarray:
+    import torch
+
+    with wave.open(str(path)) as w:
+        if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1:
+            raise SystemExit(f"{path}: expected 16kHz mono audio")
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+    smoothing = utils.ExpFilter(0.8)
+    probs = []
+    for start in range(0, len(samples) - WINDOW + 1, WINDOW):
+        chunk = torch.from_numpy(samples[start : start + WINDOW].astype(np.float32))
+        raw = model(chunk / 32768.0, SAMPLE_RATE).item()
+        probs.append(smoothing.apply(1.0, raw))
+
+    if hasattr(model, "reset_states"):
+        model.reset_states()
+
+    return np.array(probs)
+
+
+class ReplayVADStream:
+    """The end-of-speech logic of the silero stream, over precomputed probabilities."""
+
+    def __init__(self, probs: np.ndarray, min_silence: float) -> None:
+        self._probs = probs
+        self._sample_rate = SAMPLE_RATE
+        self._threshold = THRESHOLD
+        self._min_silence_samples = min_silence * SAMPLE_RATE
+        self._index = 0
+        self._pending = []
+        self._speaking = False
+        self._start = self._end = None
+        self.ends = []  # times the end of speech was detected
+
+    async def __anext__(self) -> vad.VADEvent:
+        while not self._pending:
+            if self._index >= len(self._probs):
+                raise StopAsyncIteration
+            self._step(self._probs[self._index], self._index * WINDOW)
+            self._index += 1
+
+        return self._pending.pop(0)
+
+    def _step(self, prob: float, sample: int) -> None:
+        event = vad.VADEvent
+        self._pending.append(
+            event(
+                type=vad.VADEventType.INFERENCE_DONE,
+                samples_index=sample,
+                probability=prob,
+            )
+        )
+        if prob >= self._threshold:
+            self._end = None
+            if not self._speaking:
+                self._start = sample if self._start is None else self._start
+                if sample - self._start >= MIN_SPEAKING * SAMPLE_RATE:
+                    self._speaking = True
+                    self._pending.append(
+                        event(
+                            type=vad.VADEventType.START_OF_SPEECH,
+                            samples_index=self._start,
+                        )
+                    )
+            return
+
+        if not self._speaking:
+            self._start = None
+            return
+
+        self._end = sample if self._end is None else self._end
+        if sample - self._end >= self._min_silence_samples:
+            self._speaking = False
+            self._start = None
+            self.ends.append(sample / SAMPLE_RATE)
+            self._pending.append(
+                event(type=vad.VADEventType.END_OF_SPEECH, samples_index=self._end)
+            )
+            self._end = None
+
+
+async def replay(probs, min_silence, endpointer=None, words=()) -> list:
+    stream = ReplayVADStream(probs, min_silence)
+    events = stream
+    if endpointer is not None:
+        events = _AdaptiveVADStream(stream, endpointer)
+
+    spoken = 0
+    while True:
+        try:
+            event = await events.__anext__()
+        except StopAsyncIteration:
+            return stream.ends
+
+        if endpointer is not None and words:
+            now = event.samples_index / SAMPLE_RATE
+            heard = [w for end, w in words if end <= now]
+            if len(heard) != spoken:
+                spoken = len(heard)
+                endpointer.on_transcript(" ".join(heard[-20:]))
+
+
+def score(ends: list, turn_ends: list) -> tuple:
+    latencies, cutoffs = [], 0
+    previous = 0.0
+    for turn_end in turn_ends:
+        inside = [e for e in ends if previous < e < turn_end]
+        cutoffs += len(inside)
+        after = [e for e in ends if e >= turn_end]
+        if after:
+            latencies.append(after[0] - turn_end)
+        previous = after[0] if after else turn_end
+
+    return latencies, cutoffs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("recordings", type=pathlib.Path)
+    parser.add_argument("--language", default="fr")
+    args = parser.parse_args()
+
+    from livekit.plugins import silero
+
+    model = silero.VAD()._model
+    calls = []
+    for path in sorted(args.recordings.glob("*.wav")):
+        probs = speech_probabilities(path, model)
+        labels_path = path.with_suffix(".json")
+        labels = json.loads(labels_path.read_text()) if labels_path.exists() else {}
+        speech = np.nonzero(probs >= THRESHOLD)[0]
+        last_speech = (speech[-1] + 1) * WINDOW / SAMPLE_RATE if len(speech) else 0.0
+        turn_ends = labels.get("turn_ends") or [last_speech]
+        calls.append((probs, turn_ends, labels.get("words", [])))
+
+    if not calls:
+        raise SystemExit(f"no recordings in {args.recordings}")
+
+    policy = EndpointingPolicy()
+    settings = [(f"fixed {d:.1f}s", d, False, False) for d in FIXED_DELAYS]
+    settings.append(("adaptive", policy.initial_delay, True, False))
+    if any(words for _, _, words in calls):
+        settings.append(("adaptive+cues", policy.initial_delay, True, True))
+
+    turns = sum(len(turn_ends) for _, turn_ends, _ in calls)
+    print(f"{len(calls)} recordings, {turns} turns")
+    print(f"{'setting':<14} {'latency mean':>12} {'p90':>7} {'false cut-offs':>15}")
+    for name, delay, adaptive, cues in settings:
+        latencies, cutoffs = [], 0
+        for probs, turn_ends, words in calls:
+            endpointer = Endpointer(policy, args.language) if adaptive else None
+            ends = asyncio.run(replay(probs, delay, endpointer, words if cues else ()))
+            call_latencies, call_cutoffs = score(ends, turn_ends)
+            latencies += call_latencies
+            cutoffs += call_cutoffs
+
+        p90 = sorted(latencies)[int(len(latencies) * 0.9) - 1] if latencies else 0.0
+        mean = statistics.mean(latencies) if latencies else 0.0
+        print(f"{name:<14} {mean:>11.2f}s {p90:>6.2f}s {cutoffs:>8} / {turns}")
+
+
+if __name__ == "__main__":
+    main()
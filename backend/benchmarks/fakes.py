@@ -0,0 +1,557 @@
+"""Local stand-ins for LiveKit and the providers, used by the offline harness.
+
+Nothing here opens a network connection: the room is an in-process object fed
+from recorded files, the LLM, TTS and STT answer after latencies drawn from
+configurable distributions.
+"""
+
+import asyncio
+import math
+import random
+import time
+import types
+import wave
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import llm, stt, tts
+from livekit.agents.utils import merge_frames
+from livekit.agents.voice_assistant import assistant as assistant_module
+
+FRAME_MS = 10
+REPLY = (
+    "Bien sûr, je peux vous aider avec ça. La salle de conférence se trouve au "
+    "premier étage, juste après l'escalier principal. La prochaine session "
+    "commence dans une quinzaine de minutes, et vous pourrez poser vos questions "
+    "à la fin. Voulez-vous que je vous indique aussi le vestiaire ?"
+)
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Log-normal latency given by its median and 90th percentile, in seconds."""
+
+    median: float
+    p90: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Latency":
+        median, _, p90 = value.partition(":")
+        return cls(float(median), float(p90 or median))
+
+    def sample(self) -> float:
+        if self.p90 <= self.median:
+            return self.median
+
+        sigma = math.log(self.p90 / self.median) / 1.2816
+        return random.lognormvariate(math.log(self.median), sigma)
+
+
+@dataclass(frozen=True)
+class Latencies:
+    stt_final: Latency = Latency(0.25, 0.5)
+    llm_first_token: Latency = Latency(0.45, 0.9)
+    llm_token_interval: float = 0.02
+    tts_first_byte: Latency = Latency(0.3, 0.6)
+    # synthesized audio is delivered this many times faster than real time
+    tts_speed: float = 5.0
+
+
+# --- providers
+
+
+class FakeLLM(llm.LLM):
+    def __init__(self, latencies: Latencies, reply: str = REPLY) -> None:
+        self._latencies = latencies
+        self._reply = reply
+
+    async def chat(
+        self,
+        history: llm.ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        return FakeLLMStream(self._reply, self._latencies)
+
+
+class FakeLLMStream(llm.LLMStream):
+    def __init__(self, reply: str, latencies: Latencies) -> None:
+        super().__init__()
+        self._tokens = [t + " " for t in reply.split()]
+        self._latencies = latencies
+        self._first = True
+
+    def __aiter__(self) -> "FakeLLMStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        if not self._tokens:
+            raise StopAsyncIteration
+
+        if self._first:
+            self._first = False
+            await asyncio.sleep(self._latencies.llm_first_token.sample())
+        else:
+            await asyncio.sleep(self._latencies.llm_token_interval)
+
+        delta = llm.ChoiceDelta(role=llm.ChatRole.ASSISTANT, content=self._tokens.pop(0))
+        return llm.ChatChunk(choices=[llm.Choice(delta=delta)])
+
+    async def aclose(self, wait: bool = True) -> None:
+        self._tokens = []
+
+
+class FakeTTS(tts.TTS):
+    """Non streaming TTS, like the OpenAI one, producing a tone."""
+
+    def __init__(self, latencies: Latencies, sample_rate: int = 24000) -> None:
+        super().__init__(streaming_supported=False, sample_rate=sample_rate, num_channels=1)
+        self._latencies = latencies
+
+    def synthesize(self, text: str) -> tts.ChunkedStream:
+        return FakeChunkedStream(text, self.sample_rate, self._latencies)
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    CHARS_PER_SECOND = 15
+
+    def __init__(self, text: str, sample_rate: int, latencies: Latencies) -> None:
+        self._text = text
+        self._sample_rate = sample_rate
+        self._latencies = latencies
+        self._frames = max(1, round(len(text) / self.CHARS_PER_SECOND * 10))
+        self._started = False
+
+    async def __anext__(self) -> tts.SynthesizedAudio:
+        if self._frames <= 0:
+            raise StopAsyncIteration
+
+        if not self._started:
+            self._started = True
+            await asyncio.sleep(self._latencies.tts_first_byte.sample())
+        else:
+            await asyncio.sleep(0.1 / self._latencies.tts_speed)
+
+        self._frames -= 1
+        samples = self._sample_rate // 10
+        t = np.arange(samples) / self._sample_rate
+        pcm = (np.sin(2 * np.pi * 220 * t) * 3000).astype(np.int16)
+        frame = rtc.AudioFrame(pcm.tobytes(), self._sample_rate, 1, samples)
+        return tts.SynthesizedAudio(text=self._text, data=frame)
+
+    async def aclose(self) -> None:
+        self._frames = 0
+
+
+class FakeSTT(stt.STT):
+    """Streaming STT transcribing from labels instead of the audio.
+
+    words are (end time, word) pairs and turn_ends the times the user finished
+    a turn, as in the endpointing recordings. Without them, turns are found
+    from the audio energy and transcribed with placeholder words. When the
+    recording is looped, period is its duration and the labels repeat.
+    """
+
+    def __init__(
+        self,
+        latencies: Latencies,
+        words: List[Tuple[float, str]] = (),
+        turn_ends: List[float] = (),
+        *,
+        period: float | None = None,
+    ) -> None:
+        super().__init__(streaming_supported=True)
+        self._latencies = latencies
+        self._words = sorted(words)
+        self._turn_ends = sorted(turn_ends)
+        self._period = period
+
+    async def recognize(
+        self, *, buffer, language: str | None = None
+    ) -> stt.SpeechEvent:
+        """Transcribe a buffer from its energy, a word per 100ms of speech.
+
+        A buffer has no position in the recording, the labels can't be used.
+        """
+        frame = merge_frames(buffer)
+        pcm = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32)
+        window = max(1, frame.sample_rate * frame.num_channels // 10)
+        windows = [pcm[i : i + window] for i in range(0, pcm.size, window)]
+        voiced = sum(
+            1
+            for w in windows
+            if np.sqrt(np.mean(w**2)) >= FakeSpeechStream.ENERGY_THRESHOLD
+        )
+
+        await asyncio.sleep(self._latencies.stt_final.sample())
+        text = " ".join(f"mot{i}" for i in range(voiced))
+        data = stt.SpeechData(language=language or "", text=text, confidence=1.0)
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT, alternatives=[data]
+        )
+
+    def stream(self, *, language: str | None = None) -> stt.SpeechStream:
+        return FakeSpeechStream(
+            self._latencies, self._words, self._turn_ends, self._period
+        )
+
+
+class FakeSpeechStream(stt.SpeechStream):
+    ENERGY_THRESHOLD = 500
+    MIN_PAUSE = 0.5
+
+    def __init__(self, latencies: Latencies, words, turn_ends, period) -> None:
+        self._latencies = latencies
+        self._labels = (list(words), list(turn_ends))
+        self._words, self._turn_ends = list(words), list(turn_ends)
+        self._period = period
+        self._offset = 0.0
+        self._labelled = bool(self._words or self._turn_ends)
+        self._events = asyncio.Queue()
+        self._time = 0.0
+        self._heard: List[str] = []
+        self._speech_end: float | None = None
+
+    def push_frame(self, frame: rtc.AudioFrame) -> None:
+        self._time += frame.samples_per_channel / frame.sample_rate
+        if self._period and self._time >= self._offset + self._period:
+            self._offset += self._period
+            words, turn_ends = self._labels
+            self._words = [(end + self._offset, w) for end, w in words]
+            self._turn_ends = [end + self._offset for end in turn_ends]
+
+        if self._labelled:
+            while self._words and self._words[0][0] <= self._time:
+                self._heard.append(self._words.pop(0)[1])
+                self._interim()
+            while self._turn_ends and self._turn_ends[0] <= self._time:
+                self._turn_ends.pop(0)
+                self._final()
+            return
+
+        pcm = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32)
+        if pcm.size and np.sqrt(np.mean(pcm**2)) >= self.ENERGY_THRESHOLD:
+            if self._speech_end is None or len(self._heard) % 3 == 0:
+                self._heard.append(f"mot{len(self._heard)}")
+                self._interim()
+            self._speech_end = self._time
+        elif self._speech_end is not None and self._time - self._speech_end >= self.MIN_PAUSE:
+            self._speech_end = None
+            self._final()
+
+    def _interim(self) -> None:
+        self._put(stt.SpeechEventType.INTERIM_TRANSCRIPT, " ".join(self._heard))
+
+    def _final(self) -> None:
+        if not self._heard:
+            return
+
+        text, self._heard = " ".join(self._heard), []
+        delay = self._latencies.stt_final.sample()
+        loop = asyncio.get_running_loop()
+        loop.call_later(delay, self._put, stt.SpeechEventType.FINAL_TRANSCRIPT, text)
+        loop.call_later(delay, self._put, stt.SpeechEventType.END_OF_SPEECH, text)
+
+    def _put(self, type: stt.SpeechEventType, text: str) -> None:
+        data = stt.SpeechData(language="", text=text, confidence=1.0)
+        self._events.put_nowait(stt.SpeechEvent(type=type, alternatives=[data]))
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        self._events.put_nowait(None)
+
+    async def __anext__(self) -> stt.SpeechEvent:
+        event = await self._events.get()
+        if event is None:
+            raise StopAsyncIteration
+
+        return event
+
+
+# --- room
+
+
+class _Emitter:
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[Callable]] = {}
+
+    def on(self, event: str, callback: Callable | None = None):
+        if callback is None:
+            return lambda cb: self.on(event, cb)
+
+        self._handlers.setdefault(event, []).append(callback)
+        return callback
+
+    def off(self, event: str, callback: Callable) -> None:
+        if callback in self._handlers.get(event, []):
+            self._handlers[event].remove(callback)
+
+    def emit(self, event: str, *args) -> None:
+        for callback in list(self._handlers.get(event, [])):
+            callback(*args)
+
+
+class FakeAudioTrack(rtc.RemoteAudioTrack):
+    def __init__(self, sid: str) -> None:
+        self._info = types.SimpleNamespace(sid=sid, name="microphone", muted=False)
+        self.frames = asyncio.Queue()
+
+
+class FakeVideoTrack(rtc.RemoteVideoTrack):
+    def __init__(self, sid: str) -> None:
+        self._info = types.SimpleNamespace(sid=sid, name="camera", muted=False)
+        self.streams: list[asyncio.Queue] = []
+
+
+class FakePublication:
+    def __init__(self, track, source, room=None, participant=None) -> None:
+        self.sid = "TR_" + track.sid
+        self.track = track
+        self.source = source
+        self.kind = (
+            rtc.TrackKind.KIND_VIDEO
+            if isinstance(track, rtc.RemoteVideoTrack)
+            else rtc.TrackKind.KIND_AUDIO
+        )
+        self.subscribed = True
+        self.muted = False
+        self.name = track.name
+        self._track = track
+        self._room = room
+        self._participant = participant
+
+    def set_subscribed(self, subscribed: bool) -> None:
+        if subscribed == self.subscribed:
+            return
+
+        # the track only exists while subscribed, as with the SFU
+        self.subscribed = subscribed
+        if subscribed:
+            self.track = self._track
+            self._room.emit("track_subscribed", self.track, self, self._participant)
+        else:
+            self.track = None
+            self._room.emit("track_unsubscribed", self._track, self, self._participant)
+
+
+class FakeParticipant:
+    def __init__(self, identity: str) -> None:
+        self.sid = "PA_" + identity
+        self.identity = identity
+        self.name = identity
+        self.metadata = ""
+        self.tracks: dict[str, FakePublication] = {}
+
+
+class FakeLocalParticipant(FakeParticipant):
+    def __init__(self) -> None:
+        super().__init__("agent")
+        self.transcriptions = 0
+
+    async def publish_track(self, track, options) -> FakePublication:
+        publication = FakePublication(
+            types.SimpleNamespace(sid="agent_voice", name="assistant_voice"),
+            rtc.TrackSource.SOURCE_MICROPHONE,
+        )
+        self.tracks[publication.sid] = publication
+        return publication
+
+    async def publish_transcription(self, transcription) -> None:
+        self.transcriptions += 1
+
+    async def publish_data(self, *args, **kwargs) -> None:
+        pass
+
+
+class FakeRoom(_Emitter):
+    """The parts of rtc.Room used by the agent, with one user in it."""
+
+    def __init__(self, name: str, metadata: str = "") -> None:
+        super().__init__()
+        self.name = name
+        self.sid = "RM_" + name
+        self.metadata = metadata
+        self.connection_state = rtc.ConnectionState.CONN_CONNECTED
+        self.local_participant = FakeLocalParticipant()
+        self.user = FakeParticipant("user")
+        self.participants = {self.user.sid: self.user}
+        self.microphone = FakeAudioTrack("user_microphone")
+        self._add_track(self.microphone, rtc.TrackSource.SOURCE_MICROPHONE)
+        self.camera: FakeVideoTrack | None = None
+
+    @property
+    def participants_by_identity(self) -> dict[str, FakeParticipant]:
+        return {p.identity: p for p in self.participants.values()}
+
+    def add_camera(self, subscribed: bool = True) -> FakeVideoTrack:
+        self.camera = FakeVideoTrack("user_camera")
+        publication = self._add_track(self.camera, rtc.TrackSource.SOURCE_CAMERA)
+        if not subscribed:
+            publication.subscribed = False
+            publication.track = None
+        self.emit("track_published", publication, self.user)
+        if subscribed:
+            self.emit("track_subscribed", self.camera, publication, self.user)
+        return self.camera
+
+    def _add_track(self, track, source) -> FakePublication:
+        publication = FakePublication(track, source, self, self.user)
+        self.user.tracks[publication.sid] = publication
+        return publication
+
+    def disconnect(self) -> None:
+        self.connection_state = rtc.ConnectionState.CONN_DISCONNECTED
+        self.emit("disconnected")
+
+
+class FakeAudioSource:
+    """Consumes the agent's audio in real time, as the published track would."""
+
+    def __init__(self, sample_rate: int, num_channels: int) -> None:
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self._play_until = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        now = time.monotonic()
+        self._play_until = max(self._play_until, now) + (
+            frame.samples_per_channel / frame.sample_rate
+        )
+        # keep a small buffer ahead, like the 10ms chunks of the real source
+        await asyncio.sleep(max(0.0, self._play_until - now - 0.02))
+
+
+class FakeAudioStream:
+    def __init__(self, track: FakeAudioTrack, **_) -> None:
+        self._track = track
+
+    def __aiter__(self) -> "FakeAudioStream":
+        return self
+
+    async def __anext__(self) -> rtc.AudioFrameEvent:
+        frame = await self._track.frames.get()
+        if frame is None:
+            raise StopAsyncIteration
+
+        return rtc.AudioFrameEvent(frame=frame)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakeVideoStream:
+    def __init__(self, track: FakeVideoTrack, capacity: int = 0, **_) -> None:
+        self._track = track
+        self._frames = asyncio.Queue(maxsize=capacity)
+        track.streams.append(self._frames)
+
+    def __aiter__(self) -> "FakeVideoStream":
+        return self
+
+    async def __anext__(self) -> rtc.VideoFrameEvent:
+        return await self._frames.get()
+
+    async def aclose(self) -> None:
+        if self._frames in self._track.streams:
+            self._track.streams.remove(self._frames)
+
+
+def install_rtc(*modules) -> None:
+    """Make the voice assistant and the given modules use the fake media objects."""
+    fake = types.SimpleNamespace(**vars(rtc))
+    fake.AudioSource = FakeAudioSource
+    fake.LocalAudioTrack = types.SimpleNamespace(
+        create_audio_track=lambda name, source: types.SimpleNamespace(name=name)
+    )
+    fake.AudioStream = FakeAudioStream
+    fake.VideoStream = FakeVideoStream
+    for module in (assistant_module, *modules):
+        module.rtc = fake
+
+
+# --- media
+
+
+def read_wav(path) -> Tuple[np.ndarray, int]:
+    with wave.open(str(path)) as w:
+        if w.getsampwidth() != 2:
+            raise SystemExit(f"{path}: expected 16 bits audio")
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        if w.getnchannels() > 1:
+            pcm = pcm[:: w.getnchannels()].copy()
+        return pcm, w.getframerate()
+
+
+def loop_period(pcm: np.ndarray, sample_rate: int, tail: float) -> float:
+    """Duration of one pass of play_audio over the recording."""
+    size = sample_rate * FRAME_MS // 1000
+    frames = (len(pcm) + int(tail * sample_rate)) // size
+    return frames * size / sample_rate
+
+
+async def play_audio(
+    track: FakeAudioTrack,
+    pcm: np.ndarray,
+    sample_rate: int,
+    tail: float,
+    *,
+    loop: bool = False,
+) -> None:
+    """Push the recording into the microphone track in real time, then silence."""
+    size = sample_rate * FRAME_MS // 1000
+    silence = np.zeros(int(tail * sample_rate), dtype=np.int16)
+    audio = np.concatenate([pcm, silence])
+    # whole frames only, so the looped audio keeps the same timing as the labels
+    audio = audio[: len(audio) - len(audio) % size]
+    start = time.monotonic()
+    i = 0
+    while True:
+        for offset in range(0, len(audio), size):
+            chunk = audio[offset : offset + size]
+            track.frames.put_nowait(
+                rtc.AudioFrame(chunk.tobytes(), sample_rate, 1, size)
+            )
+            i += 1
+            await asyncio.sleep(
+                max(0.0, start + i * FRAME_MS / 1000 - time.monotonic())
+            )
+
+        if not loop:
+            break
+
+    track.frames.put_nowait(None)
+
+
+async def play_video(track: FakeVideoTrack, path) -> None:
+    """Decode a video file in real time into the camera track, looping over it."""
+    import av
+
+    start = time.monotonic()
+    offset = 0.0
+    while True:
+        with av.open(str(path)) as container:
+            stream = container.streams.video[0]
+            last = 0.0
+            for frame in container.decode(stream):
+                at = offset + float(frame.pts * stream.time_base) if frame.pts else offset
+                last = at
+                await asyncio.sleep(max(0.0, start + at - time.monotonic()))
+                if not track.streams:
+                    continue
+
+                rgba = frame.to_ndarray(format="rgba")
+                video = rtc.VideoFrame(
+                    rgba.shape[1], rgba.shape[0], rtc.VideoBufferType.RGBA, rgba.tobytes()
+                )
+                event = rtc.VideoFrameEvent(
+                    frame=video,
+                    timestamp_us=int(at * 1e6),
+                    rotation=rtc.VideoRotation.VIDEO_ROTATION_0,
+                )
+                for queue in track.streams:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(event)
+        offset = last + 1 / 30
@@ -0,0 +1,281 @@
+"""Offline end-to-end benchmark of the agent sessions.
+
+Runs the worker's entrypoint for a persona against a fake room fed with
+recorded calls (WAV, optionally a video file for the camera), with local
+stand-ins for the OpenAI LLM and TTS and the Deepgram STT answering after
+configurable latencies (median:p90, in seconds). Each session runs in its own
+process, forked from a parent holding the models as the worker does, and the
+report gives the turn latency percentiles per stage, and the CPU and memory
+used by each session. Nothing is sent over the network.
+
+Recordings can be labelled as for eval_endpointing.py (<name>.json with
+"words" and "turn_ends"), the fake STT then transcribes from the labels,
+otherwise from the audio energy.
+
+    python benchmarks/harness.py recordings/ --persona summit_agent_fr --sessions 4
+    python benchmarks/harness.py recordings/ --persona photo_agent_fr --video cam.mp4
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+import admission  # noqa: E402
+import answer_cache  # noqa: E402
+import audio_cache  # noqa: E402
+import connections  # noqa: E402
+import metrics  # noqa: E402
+import models  # noqa: E402
+import prompt_cache  # noqa: E402
+import tts_cache  # noqa: E402
+import vision  # noqa: E402
+import worker  # noqa: E402
+
+import fakes  # noqa: E402
+
+
+@dataclass
+class Recording:
+    path: pathlib.Path
+    words: List[Tuple[float, str]] = field(default_factory=list)
+    turn_ends: List[float] = field(default_factory=list)
+
+
+class StageRecorder:
+    """Takes the place of the metrics histograms, keeping every value."""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, List[float]] = defaultdict(list)
+
+    def observe(self, persona: str, stage: str, seconds: float) -> None:
+        self.values[stage].append(seconds)
+
+
+def load_recordings(directory: pathlib.Path) -> List[Recording]:
+    recordings = []
+    for path in sorted(directory.glob("*.wav")):
+        labels_path = path.with_suffix(".json")
+        labels = json.loads(labels_path.read_text()) if labels_path.exists() else {}
+        recordings.append(
+            Recording(
+                path,
+                [tuple(w) for w in labels.get("words", [])],
+                labels.get("turn_ends", []),
+            )
+        )
+
+    return recordings
+
+
+def isolate_state(directory: pathlib.Path) -> None:
+    """Keep what the sessions cache in directory, away from the worker's files.
+
+    The fake replies would otherwise be served to real callers from the answer
+    cache, and the fake audio played from the TTS and audio caches.
+    """
+    os.environ[answer_cache.ANSWER_CACHE_PATH_ENV] = str(directory / "answers.db")
+    os.environ[tts_cache.TTS_CACHE_DIR_ENV] = str(directory / "tts_cache")
+    os.environ[audio_cache.AUDIO_CACHE_DIR_ENV] = str(directory / "audio_cache")
+    os.environ[prompt_cache.PREFIX_STATE_ENV] = str(directory / "prompt_prefixes.json")
+    # the module caches were made at import, with the worker's directories
+    audio_cache.cache = audio_cache.AudioCache()
+    tts_cache.cache = tts_cache.TTSCache(spill_dir=directory / "tts_cache")
+
+
+def install_fakes(
+    recording: Recording,
+    latencies: fakes.Latencies,
+    state_dir: pathlib.Path,
+    period: float | None = None,
+) -> None:
+    """Make the worker use the local stand-ins, in the session process."""
+    os.environ[connections.PREWARM_ENV] = "0"
+    isolate_state(state_dir)
+    worker.openai = types.SimpleNamespace(
+        LLM=lambda **_: fakes.FakeLLM(latencies),
+        TTS=lambda **_: fakes.FakeTTS(latencies),
+    )
+    worker.deepgram = types.SimpleNamespace(
+        STT=lambda **_: fakes.FakeSTT(
+            latencies, recording.words, recording.turn_ends, period=period
+        )
+    )
+    fakes.install_rtc(vision)
+
+
+def job_context(room: fakes.FakeRoom, job_id: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        room=room, id=job_id, job=types.SimpleNamespace(id=job_id, metadata="")
+    )
+
+
+async def run_session(index: int, persona, recording: Recording, args) -> dict:
+    install_fakes(recording, args.latencies, args.state_dir)
+    recorder = StageRecorder()
+    metrics.histograms = recorder
+
+    pcm, sample_rate = fakes.read_wav(recording.path)
+    room = fakes.FakeRoom(f"harness-{index}")
+    ctx = job_context(room, f"harness-{index}")
+
+    process = psutil.Process()
+    cpu_start = sum(process.cpu_times()[:2])
+    start = time.monotonic()
+    tasks = [asyncio.create_task(worker.entrypoint(persona, ctx))]
+    if args.video:
+        camera = room.add_camera(subscribed=worker.subscribes_video(persona, room.name))
+        tasks.append(asyncio.create_task(fakes.play_video(camera, args.video)))
+
+    await fakes.play_audio(room.microphone, pcm, sample_rate, args.tail)
+    room.disconnect()
+    for task in tasks:
+        task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    wall = time.monotonic() - start
+    return {
+        "persona": persona.name,
+        "recording": recording.path.name,
+        "stages": dict(recorder.values),
+        "cpu_s": sum(process.cpu_times()[:2]) - cpu_start,
+        "wall_s": wall,
+        "uss_mb": process.memory_full_info().uss / 1024 / 1024,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _session_main(index: int, persona, recording: Recording, args, results) -> None:
+    results.put(asyncio.run(run_session(index, persona, recording, args)))
+
+
+def _percentiles(values: List[float]) -> str:
+    if not values:
+        return f"{'-':>7} {'-':>7} {'-':>7}"
+
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return f"{p50:>6.2f}s {p90:>6.2f}s {p99:>6.2f}s"
+
+
+def report(sessions: List[dict]) -> dict:
+    summary = {}
+    for persona in sorted({s["persona"] for s in sessions}):
+        runs = [s for s in sessions if s["persona"] == persona]
+        stages = {
+            stage: [v for s in runs for v in s["stages"].get(stage, [])]
+            for stage in metrics.STAGES
+        }
+        cpu = [s["cpu_s"] / s["wall_s"] for s in runs]
+        uss = [s["uss_mb"] for s in runs]
+        turns = len(stages["turn_end"])
+
+        print(f"\n{persona}: {len(runs)} sessions, {turns} turns")
+        print(f"{'stage':<16} {'p50':>7} {'p90':>7} {'p99':>7}")
+        for stage, values in stages.items():
+            print(f"{stage:<16} {_percentiles(values)}")
+        print(f"cpu per session     mean {np.mean(cpu):.1%} max {max(cpu):.1%} of a core")
+        print(f"memory per session  mean {np.mean(uss):.0f}MB max {max(uss):.0f}MB (uss)")
+
+        summary[persona] = {
+            "sessions": len(runs),
+            "turns": turns,
+            "stages": {
+                stage: dict(zip(("p50", "p90", "p99"), np.percentile(v, [50, 90, 99])))
+                for stage, v in stages.items()
+                if v
+            },
+            "cpu_core": float(np.mean(cpu)),
+            "uss_mb": float(np.mean(uss)),
+        }
+
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("recordings", type=pathlib.Path)
+    parser.add_argument(
+        "--persona",
+        action="append",
+        help="persona to run, repeat to alternate between several",
+    )
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent sessions")
+    parser.add_argument("--video", type=pathlib.Path, help="video fed to the camera")
+    parser.add_argument("--tail", type=float, default=5.0, help="silence after a call")
+    parser.add_argument("--stt-latency", default="0.25:0.5", type=fakes.Latency.parse)
+    parser.add_argument("--llm-latency", default="0.45:0.9", type=fakes.Latency.parse)
+    parser.add_argument("--tts-latency", default="0.3:0.6", type=fakes.Latency.parse)
+    parser.add_argument("--json", type=pathlib.Path, help="write the summary here")
+    args = parser.parse_args()
+    args.latencies = fakes.Latencies(
+        stt_final=args.stt_latency,
+        llm_first_token=args.llm_latency,
+        tts_first_byte=args.tts_latency,
+    )
+
+    recordings = load_recordings(args.recordings)
+    if not recordings:
+        raise SystemExit(f"no recordings in {args.recordings}")
+
+    personas = worker.get_personas()
+    names = args.persona or [os.environ.get(worker.DEFAULT_PERSONA_ENV)]
+    unknown = [n for n in names if n not in personas]
+    if unknown:
+        raise SystemExit(f"unknown personas {unknown}, choose from {sorted(personas)}")
+
+    with tempfile.TemporaryDirectory(prefix="harness-") as state_dir:
+        args.state_dir = pathlib.Path(state_dir)
+        isolate_state(args.state_dir)
+
+        # same preloading as the worker, before the sessions are forked
+        admission.setup(list(personas))
+        models.registry.load()
+        audio_cache.cache.load()
+
+        context = mp.get_context("fork")
+        results = context.Queue()
+        processes = []
+        for i in range(args.sessions):
+            process = context.Process(
+                target=_session_main,
+                args=(
+                    i,
+                    personas[names[i % len(names)]],
+                    recordings[i % len(recordings)],
+                    args,
+                    results,
+                ),
+            )
+            process.start()
+            processes.append(process)
+
+        sessions = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = report(sessions)
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Find how many concurrent sessions one worker sustains, per persona and pipeline.
+
+Ramps synthetic sessions against the worker's entrypoint, with the fake room
+and the local provider stand-ins of harness.py: every --interval seconds
+--step more sessions join, each looping a recording (and the --video on its
+camera). At each level the sessions report their event loop lag, the audio
+underruns of the answers (segments played late) and the time to the first
+audio of each answer. The ramp stops when one of them crosses its threshold,
+the capacity is the last level that held.
+
+Configurations:
+    vision  the persona as defined, with the camera video if given
+    audio   the persona without vision
+    sip     a SIP room (audio only, as the worker does for SIP calls)
+
+    python benchmarks/loadgen.py recordings/ --persona summit_agent_fr --config audio --config sip
+"""
+
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import json
+import multiprocessing as mp
+import os
+import pathlib
+import queue
+import sys
+import tempfile
+import time
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+import admission  # noqa: E402
+import audio_cache  # noqa: E402
+import metrics  # noqa: E402
+import models  # noqa: E402
+import tts_pipeline  # noqa: E402
+import worker  # noqa: E402
+
+import fakes  # noqa: E402
+import harness  # noqa: E402
+
+CONFIGS = ("vision", "audio", "sip")
+LAG_PROBE_INTERVAL = 0.1
+
+
+class _Reporter:
+    """Send the samples of a session process to the load generator."""
+
+    def __init__(self, samples) -> None:
+        self._samples = samples
+
+    def __call__(self, kind: str, value: float) -> None:
+        self._samples.put((time.time(), kind, value))
+
+    # in place of the metrics histograms
+    def observe(self, persona: str, stage: str, seconds: float) -> None:
+        if stage == "first_audio":
+            self("first_audio", seconds)
+
+
+def _reporting_stats(report: _Reporter):
+    class ReportingPlaybackStats(tts_pipeline.PlaybackStats):
+        def start_segment(self) -> None:
+            super().start_segment()
+            report("segment", 1.0)
+
+        def on_frame(self, frame) -> None:
+            underruns = self.underruns
+            super().on_frame(frame)
+            if self.underruns > underruns:
+                report("underrun", self.max_gap)
+
+    return ReportingPlaybackStats
+
+
+async def _probe_loop_lag(report: _Reporter) -> None:
+    worst, since = 0.0, time.monotonic()
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        worst = max(worst, time.monotonic() - start - LAG_PROBE_INTERVAL)
+        if time.monotonic() - since >= 1.0:
+            report("loop_lag", worst)
+            worst, since = 0.0, time.monotonic()
+
+
+async def load_session(index: int, persona, config: str, recording, args, stop, samples):
+    report = _Reporter(samples)
+    pcm, sample_rate = fakes.read_wav(recording.path)
+    harness.install_fakes(
+        recording,
+        args.latencies,
+        args.state_dir,
+        period=fakes.loop_period(pcm, sample_rate, args.tail),
+    )
+    tts_pipeline.PlaybackStats = _reporting_stats(report)
+    metrics.histograms = report
+
+    name = f"{'sip' if config == 'sip' else 'load'}-{index}"
+    room = fakes.FakeRoom(name)
+    tasks = [
+        asyncio.create_task(worker.entrypoint(persona, harness.job_context(room, name))),
+        asyncio.create_task(
+            fakes.play_audio(room.microphone, pcm, sample_rate, args.tail, loop=True)
+        ),
+        asyncio.create_task(_probe_loop_lag(report)),
+    ]
+    if config == "vision" and args.video:
+        camera = room.add_camera(subscribed=worker.subscribes_video(persona, name))
+        tasks.append(asyncio.create_task(fakes.play_video(camera, args.video)))
+
+    while not stop.is_set():
+        await asyncio.sleep(0.5)
+
+    room.disconnect()
+    for task in tasks:
+        task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _load_session_main(*args) -> None:
+    asyncio.run(load_session(*args))
+
+
+def level_stats(samples: list) -> dict:
+    lags = [v for _, kind, v in samples if kind == "loop_lag"]
+    first_audio = [v for _, kind, v in samples if kind == "first_audio"]
+    segments = sum(1 for _, kind, _ in samples if kind == "segment")
+    underruns = sum(1 for _, kind, _ in samples if kind == "underrun")
+    return {
+        "loop_lag_p95": float(np.percentile(lags, 95)) if lags else 0.0,
+        "underrun_rate": underruns / segments if segments else 0.0,
+        "first_audio_p90": float(np.percentile(first_audio, 90)) if first_audio else None,
+        "turns": len(first_audio),
+    }
+
+
+def breached(stats: dict, args, first_audio_limit: float | None) -> str | None:
+    if stats["loop_lag_p95"] > args.max_loop_lag:
+        return f"loop lag p95 {stats['loop_lag_p95']:.3f}s"
+    if stats["underrun_rate"] > args.max_underruns:
+        return f"underruns {stats['underrun_rate']:.0%} of segments"
+    first_audio = stats["first_audio_p90"]
+    if first_audio_limit is not None and (first_audio or 0.0) > first_audio_limit:
+        return f"first audio p90 {first_audio:.2f}s"
+    return None
+
+
+def ramp(persona, config: str, recordings, args) -> dict:
+    context = mp.get_context("fork")
+    stop = context.Event()
+    samples = context.Queue()
+    processes = []
+    received = []
+    levels = []
+    capacity, reason = 0, f"reached {args.max_sessions} sessions"
+    first_audio_limit = args.max_first_audio
+
+    print(f"\n{persona.name} / {config}")
+    print(f"{'sessions':>8} {'cpu':>5} {'loop lag p95':>13} {'underruns':>10} {'first audio p90':>16}")
+    try:
+        while len(processes) < args.max_sessions:
+            for _ in range(min(args.step, args.max_sessions - len(processes))):
+                index = len(processes)
+                process = context.Process(
+                    target=_load_session_main,
+                    args=(
+                        index,
+                        persona,
+                        config,
+                        recordings[index % len(recordings)],
+                        args,
+                        stop,
+                        samples,
+                    ),
+                )
+                process.start()
+                processes.append(process)
+
+            level_start = time.time()
+            psutil.cpu_percent(interval=None)
+            while time.time() < level_start + args.interval:
+                with contextlib.suppress(queue.Empty):
+                    received.append(samples.get(timeout=0.5))
+
+            cpu = psutil.cpu_percent(interval=None) / 100
+            window = [s for s in received if s[0] >= level_start + args.warmup]
+            stats = level_stats(window)
+            stats.update(sessions=len(processes), cpu=cpu)
+            levels.append(stats)
+            first_audio = stats["first_audio_p90"]
+            print(
+                f"{len(processes):>8} {cpu:>5.0%} {stats['loop_lag_p95']:>12.3f}s "
+                f"{stats['underrun_rate']:>10.0%} "
+                f"{'-' if first_audio is None else f'{first_audio:.2f}s':>16}"
+            )
+
+            if first_audio_limit is None and first_audio is not None:
+                # relative to the latency of the first, lightly loaded, level
+                first_audio_limit = first_audio + args.first_audio_margin
+
+            limit = breached(stats, args, first_audio_limit)
+            if limit is not None:
+                reason = limit
+                break
+
+            capacity = len(processes)
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    return {
+        "persona": persona.name,
+        "config": config,
+        "capacity": capacity,
+        "per_core": capacity / (os.cpu_count() or 1),
+        "limited_by": reason,
+        "levels": levels,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("recordings", type=pathlib.Path)
+    parser.add_argument("--persona", action="append", help="repeat for several")
+    parser.add_argument("--config", action="append", choices=CONFIGS)
+    parser.add_argument("--video", type=pathlib.Path, help="video fed to the camera")
+    parser.add_argument("--step", type=int, default=2, help="sessions added per level")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds per level")
+    parser.add_argument("--warmup", type=float, default=10.0, help="ignored at each level")
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--tail", type=float, default=3.0, help="silence between loops")
+    parser.add_argument("--max-loop-lag", type=float, default=0.05)
+    parser.add_argument("--max-underruns", type=float, default=0.05)
+    parser.add_argument(
+        "--max-first-audio",
+        type=float,
+        help="first audio p90 limit, by default the first level's plus --first-audio-margin",
+    )
+    parser.add_argument("--first-audio-margin", type=float, default=0.5)
+    parser.add_argument("--stt-latency", default="0.25:0.5", type=fakes.Latency.parse)
+    parser.add_argument("--llm-latency", default="0.45:0.9", type=fakes.Latency.parse)
+    parser.add_argument("--tts-latency", default="0.3:0.6", type=fakes.Latency.parse)
+    parser.add_argument("--json", type=pathlib.Path, help="write the report here")
+    args = parser.parse_args()
+    args.latencies = fakes.Latencies(
+        stt_final=args.stt_latency,
+        llm_first_token=args.llm_latency,
+        tts_first_byte=args.tts_latency,
+    )
+
+    recordings = harness.load_recordings(args.recordings)
+    if not recordings:
+        raise SystemExit(f"no recordings in {args.recordings}")
+
+    personas = worker.get_personas()
+    names = args.persona or [os.environ.get(worker.DEFAULT_PERSONA_ENV)]
+    unknown = [n for n in names if n not in personas]
+    if unknown:
+        raise SystemExit(f"unknown personas {unknown}, choose from {sorted(personas)}")
+
+    with tempfile.TemporaryDirectory(prefix="loadgen-") as state_dir:
+        args.state_dir = pathlib.Path(state_dir)
+        harness.isolate_state(args.state_dir)
+
+        admission.setup(
+            list(personas), admission.AdmissionLimits(max_sessions=args.max_sessions)
+        )
+        models.registry.load()
+        audio_cache.cache.load()
+
+        results = []
+        for name in names:
+            for config in args.config or CONFIGS:
+                persona = personas[name]
+                if config == "audio":
+                    persona = dataclasses.replace(persona, vision=False)
+                results.append(ramp(persona, config, recordings, args))
+
+    print(f"\n{'persona':<20} {'config':<7} {'sessions':>8} {'per core':>9}  limited by")
+    for r in results:
+        print(
+            f"{r['persona']:<20} {r['config']:<7} {r['capacity']:>8} "
+            f"{r['per_core']:>9.2f}  {r['limited_by']}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import asyncio
+import ctypes
+import logging
+import multiprocessing as mp
+import os
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, List
+
+import psutil
+
+# sessions a single box can track, far above what it can serve
+MAX_SLOTS = 256
+# an accepted job counts as a session until its process registers
+PENDING_TTL = 30.0
+MONITOR_INTERVAL = 1.0
+# jobs report the worst lag of their last intervals, the worker samples them
+# every MONITOR_INTERVAL and doesn't miss a short stall
+LAG_WINDOW = 5
+
+
+@dataclass(frozen=True)
+class AdmissionLimits:
+    """Worker wide limits, a job is rejected when one of them is reached."""
+
+    max_sessions: int = 20
+    max_cpu: float = 0.85
+    max_loop_lag: float = 0.25
+    max_rss_mb: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "AdmissionLimits":
+        defaults = cls()
+        max_rss_mb = os.environ.get("ADMISSION_MAX_RSS_MB")
+        return cls(
+            max_sessions=int(
+                os.environ.get("ADMISSION_MAX_SESSIONS", defaults.max_sessions)
+            ),
+            max_cpu=float(os.environ.get("ADMISSION_MAX_CPU", defaults.max_cpu)),
+            max_loop_lag=float(
+                os.environ.get("ADMISSION_MAX_LOOP_LAG", defaults.max_loop_lag)
+            ),
+            max_rss_mb=float(max_rss_mb) if max_rss_mb else None,
+        )
+
+
+class _Slot(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_int),
+        ("persona", ctypes.c_int),
+        ("job_id", ctypes.c_char * 64),
+        # written by the job every MONITOR_INTERVAL: the lag of its event loop,
+        # and when it was measured (time.monotonic(), the same in every process)
+        ("loop_lag", ctypes.c_double),
+        ("beat", ctypes.c_double),
+    ]
+
+
+class AdmissionController:
+    """Accept or reject jobs from the live load of the worker.
+
+    Jobs run in processes forked from the worker, each one registers in a slot
+    of a shared memory table (created before the fork) for the duration of its
+    session. The worker counts the slots whose process is alive, so a crashed
+    job never holds a session. The audio of a session is processed by the event
+    loop of its job process: each job reports the lag of its loop in its slot,
+    and the worker's loop_lag is the largest of them and its own.
+    """
+
+    def __init__(self, persona_names: List[str], limits: AdmissionLimits) -> None:
+        self._names = list(persona_names)
+        self._limits = limits
+        self._slots = mp.Array(_Slot, MAX_SLOTS)
+        self._pending: Dict[str, tuple[str, float]] = {}
+        self._monitor: asyncio.Task | None = None
+        self._probe: asyncio.Task | None = None
+
+        self.cpu = 0.0
+        self.rss_mb = 0.0
+        self.loop_lag = 0.0
+        self.rejections: Counter[str] = Counter()
+
+    @property
+    def limits(self) -> AdmissionLimits:
+        return self._limits
+
+    def add_persona(self, name: str) -> None:
+        """Count the sessions of a new persona, before forking them."""
+        if name not in self._names:
+            self._names.append(name)
+
+    # job process side
+
+    def register(self, job_id: str, persona: str) -> int | None:
+        with self._slots.get_lock():
+            for i, slot in enumerate(self._slots):
+                if slot.pid == 0 or not psutil.pid_exists(slot.pid):
+                    slot.pid = os.getpid()
+                    slot.persona = self._names.index(persona)
+                    slot.job_id = job_id.encode()[:63]
+                    slot.loop_lag = 0.0
+                    slot.beat = time.monotonic()
+                    self._start_probe(i)
+                    return i
+
+        logging.warning("no free admission slot for job %s", job_id)
+        return None
+
+    def release(self, index: int | None) -> None:
+        if index is None:
+            return
+
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        with self._slots.get_lock():
+            if self._slots[index].pid == os.getpid():
+                self._slots[index].pid = 0
+
+    def _start_probe(self, index: int) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._probe = loop.create_task(self._probe_task(index))
+
+    async def _probe_task(self, index: int) -> None:
+        slot = self._slots[index]
+        lags: deque[float] = deque(maxlen=LAG_WINDOW)
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(MONITOR_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - start - MONITOR_INTERVAL))
+            with self._slots.get_lock():
+                if slot.pid != os.getpid():
+                    return
+                slot.loop_lag = max(lags)
+                slot.beat = time.monotonic()
+
+    # worker side
+
+    def sessions(self) -> Counter[str]:
+        """Running sessions per persona, accepted jobs not started yet included."""
+        sessions: Counter[str] = Counter()
+        registered = set()
+        with self._slots.get_lock():
+            for slot in self._slots:
+                if slot.pid and psutil.pid_exists(slot.pid):
+                    sessions[self._names[slot.persona]] += 1
+                    registered.add(slot.job_id.decode())
+
+        now = time.monotonic()
+        for job_id, (persona, accepted_at) in list(self._pending.items()):
+            if job_id in registered or now - accepted_at > PENDING_TTL:
+                del self._pending[job_id]
+            else:
+                sessions[persona] += 1
+
+        return sessions
+
+    def jobs_loop_lag(self) -> float:
+        """Largest event loop lag of the running jobs.
+
+        A job whose loop is stalled right now can't report it, the time since
+        its last report counts as lag.
+        """
+        now = time.monotonic()
+        lag = 0.0
+        with self._slots.get_lock():
+            for slot in self._slots:
+                if slot.pid and psutil.pid_exists(slot.pid):
+                    stalled = now - slot.beat - MONITOR_INTERVAL
+                    lag = max(lag, slot.loop_lag, stalled)
+
+        return lag
+
+    def check(self, persona: str, max_sessions: int | None = None) -> str | None:
+        """Return why a job for persona can't be accepted now, None to accept it."""
+        self._ensure_monitor()
+        limits = self._limits
+        sessions = self.sessions()
+        if sum(sessions.values()) >= limits.max_sessions:
+            kind, reason = "sessions", f"worker at {limits.max_sessions} sessions"
+        elif max_sessions is not None and sessions[persona] >= max_sessions:
+            kind, reason = "persona_sessions", f"{persona} at {max_sessions} sessions"
+        elif self.cpu >= limits.max_cpu:
+            kind, reason = "cpu", f"cpu at {self.cpu:.0%}"
+        elif self.loop_lag >= limits.max_loop_lag:
+            kind, reason = "loop_lag", f"event loop lagging {self.loop_lag:.2f}s"
+        elif limits.max_rss_mb is not None and self.rss_mb >= limits.max_rss_mb:
+            kind, reason = "memory", f"memory at {self.rss_mb:.0f}MB"
+        else:
+            return None
+
+        self.rejections[kind] += 1
+        return reason
+
+    def admit(self, job_id: str, persona: str) -> None:
+        self._pending[job_id] = (persona, time.monotonic())
+
+    def load(self) -> float:
+        """Worker load reported to the server, 1.0 is full."""
+        self._ensure_monitor()
+        limits = self._limits
+        loads = [
+            sum(self.sessions().values()) / limits.max_sessions,
+            self.cpu / limits.max_cpu,
+            self.loop_lag / limits.max_loop_lag,
+        ]
+        if limits.max_rss_mb:
+            loads.append(self.rss_mb / limits.max_rss_mb)
+
+        return max(loads)
+
+    def _ensure_monitor(self) -> None:
+        if self._monitor is None:
+            self._monitor = asyncio.get_running_loop().create_task(self._monitor_task())
+
+    async def _monitor_task(self) -> None:
+        process = psutil.Process()
+        psutil.cpu_percent(interval=None)
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(MONITOR_INTERVAL)
+            worker_lag = time.perf_counter() - start - MONITOR_INTERVAL
+            self.loop_lag = max(0.0, worker_lag, self.jobs_loop_lag())
+            self.cpu = psutil.cpu_percent(interval=None) / 100
+
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.rss_mb = rss / 1024 / 1024
+
+
+controller: AdmissionController | None = None
+
+
+def setup(persona_names: List[str], limits: AdmissionLimits | None = None) -> None:
+    """Create the controller, must run in the worker before any job is forked."""
+    global controller
+    controller = AdmissionController(persona_names, limits or AdmissionLimits.from_env())
+
+
+def load() -> float:
+    # module level function, WorkerOptions must stay picklable
+    if controller is None:
+        return psutil.cpu_percent() / 100
+
+    return controller.load()
@@ -0,0 +1,440 @@
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from livekit.agents import llm
+from livekit.agents.llm import ChatContext, ChatRole
+
+from lexical import BM25, terms
+
+ANSWER_CACHE_PATH_ENV = "ANSWER_CACHE_PATH"
+DEFAULT_ANSWER_CACHE_PATH = (
+    pathlib.Path(__file__).resolve().parents[1] / "answer_cache.db"
+)
+# entries kept per persona, the least asked are dropped first
+MAX_ENTRIES = 1000
+
+
+def persona_fingerprint(persona) -> str:
+    """Changes with any field of the persona, answers recorded before expire."""
+    data = json.dumps(dataclasses.asdict(persona), sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+@dataclass
+class Entry:
+    id: int
+    question: str
+    answer: str
+    # times the LLM answered this question
+    seen: int
+    terms: Counter
+    # terms of the previous question of the user, empty for the first one
+    context: Counter
+
+
+class AnswerIndex:
+    """BM25 index of the questions of one persona, with their previous question."""
+
+    def __init__(self, entries: List[Entry]) -> None:
+        self._entries = entries
+        self._bm25 = BM25([e.terms + e.context for e in entries])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _similarity(self, a: Counter, b: Counter) -> float:
+        """Share of the words of each text found in the other, weighted by idf."""
+        if not a and not b:
+            return 1.0
+
+        shared = a.keys() & b.keys()
+        idf = self._bm25.idf
+
+        def covered(words) -> float:
+            total = sum(idf(w) for w in words)
+            return sum(idf(w) for w in shared & words) / total if total else 0.0
+
+        return min(covered(a.keys()), covered(b.keys()))
+
+    def confidence(self, query: Counter, context: Counter, entry: Entry) -> float:
+        # a follow-up only matches the same question asked after the same one
+        return min(
+            self._similarity(query, entry.terms),
+            self._similarity(context, entry.context),
+        )
+
+    def best(self, query: Counter, context: Counter) -> Tuple[Entry | None, float]:
+        # the confidence decides, BM25 only picks the candidates
+        top = self._bm25.top(query + context, 5)
+        candidates = [self._entries[i] for _, i in top]
+        if not candidates:
+            return None, 0.0
+
+        entry = max(candidates, key=lambda e: self.confidence(query, context, e))
+        return entry, self.confidence(query, context, entry)
+
+
+class AnswerStore:
+    """Questions and answers of every persona, in a SQLite file shared by the sessions."""
+
+    def __init__(self, path: str | os.PathLike | None = None) -> None:
+        if path is None:
+            path = os.environ.get(ANSWER_CACHE_PATH_ENV, DEFAULT_ANSWER_CACHE_PATH)
+
+        self._path = pathlib.Path(path)
+        self._db: sqlite3.Connection | None = None
+        # the connection is used from the threads of asyncio.to_thread
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self._path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = [r[1] for r in self._db.execute("PRAGMA table_info(answers)")]
+            if columns and "context_key" not in columns:
+                # recorded before the previous questions were kept, it's only a cache
+                with self._db:
+                    self._db.execute("DROP TABLE answers")
+            # question_key and context_key are the question and the previous one
+            # reduced to their terms, the sessions asking the same question after
+            # the same one add to the same row
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY,
+                    persona TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    question_key TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    context_key TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    seen INTEGER NOT NULL DEFAULT 1,
+                    served INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (persona, fingerprint, question_key, context_key)
+                )"""
+            )
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def version(self) -> int:
+        # changes when another session commits
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def expire(self, persona: str, fingerprint: str) -> int:
+        """Drop the answers recorded for the other definitions of the persona.
+
+        Only at the start of the worker or when the persona is reloaded: until
+        they end, sessions started before a reload still use their definition.
+        """
+        with self._lock, self._connect() as db:
+            return db.execute(
+                "DELETE FROM answers WHERE persona = ? AND fingerprint != ?",
+                (persona, fingerprint),
+            ).rowcount
+
+    def load(self, persona: str, fingerprint: str, language: str) -> List[Entry]:
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT id, question, answer, seen, context FROM answers"
+                    " WHERE persona = ? AND fingerprint = ?",
+                    (persona, fingerprint),
+                )
+                .fetchall()
+            )
+        return [
+            Entry(
+                id,
+                question,
+                answer,
+                seen,
+                Counter(terms(question, language)),
+                Counter(terms(context, language)),
+            )
+            for id, question, answer, seen, context in rows
+        ]
+
+    def record(
+        self,
+        persona: str,
+        fingerprint: str,
+        language: str,
+        question: str,
+        answer: str,
+        same_as: int | None,
+        context: str = "",
+    ) -> None:
+        with self._lock, self._connect() as db:
+            if same_as is not None:
+                # the latest answer is kept, it was given with the latest context
+                db.execute(
+                    "UPDATE answers SET seen = seen + 1, answer = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (answer, time.time(), same_as),
+                )
+                return
+
+            # another session may have recorded it since this one loaded the index
+            db.execute(
+                """INSERT INTO answers (
+                    persona, fingerprint, question, question_key, context,
+                    context_key, answer, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (persona, fingerprint, question_key, context_key)
+                DO UPDATE SET
+                    seen = seen + 1, answer = excluded.answer,
+                    updated_at = excluded.updated_at""",
+                (
+                    persona,
+                    fingerprint,
+                    question,
+                    " ".join(terms(question, language)),
+                    context,
+                    " ".join(terms(context, language)),
+                    answer,
+                    time.time(),
+                ),
+            )
+            db.execute(
+                """DELETE FROM answers WHERE persona = ? AND id NOT IN (
+                    SELECT id FROM answers WHERE persona = ?
+                    ORDER BY seen + served DESC, updated_at DESC LIMIT ?
+                )""",
+                (persona, persona, MAX_ENTRIES),
+            )
+
+    def served(self, entry_id: int) -> None:
+        with self._lock, self._connect() as db:
+            db.execute(
+                "UPDATE answers SET served = served + 1 WHERE id = ?", (entry_id,)
+            )
+
+
+def expire_answers(personas: dict) -> None:
+    """Drop the answers recorded for previous definitions of the personas."""
+    store = AnswerStore()
+    try:
+        for name, persona in personas.items():
+            expired = store.expire(name, persona_fingerprint(persona))
+            if expired:
+                logging.info("expired %d cached answers of persona %s", expired, name)
+    except sqlite3.Error:
+        logging.exception("failed to expire the cached answers")
+    finally:
+        store.close()
+
+
+class _CachedAnswerStream(llm.LLMStream):
+    def __init__(self, answer: str) -> None:
+        super().__init__()
+        self._answer = answer
+
+    def __aiter__(self) -> "_CachedAnswerStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        if self._answer is None:
+            raise StopAsyncIteration
+
+        answer, self._answer = self._answer, None
+        return llm.ChatChunk(
+            choices=[
+                llm.Choice(
+                    delta=llm.ChoiceDelta(role=ChatRole.ASSISTANT, content=answer)
+                )
+            ]
+        )
+
+    async def aclose(self, wait: bool = True) -> None:
+        self._answer = None
+
+
+class _RecordingStream(llm.LLMStream):
+    """Pass the answer through, and hand it to on_done if it was read to the end."""
+
+    def __init__(self, inner: llm.LLMStream, on_done) -> None:
+        super().__init__()
+        self._inner = inner
+        self._on_done = on_done
+        self._content: List[str] = []
+
+    @property
+    def called_functions(self) -> list[llm.CalledFunction]:
+        return self._inner.called_functions
+
+    def __aiter__(self) -> "_RecordingStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        try:
+            chunk = await self._inner.__anext__()
+        except StopAsyncIteration:
+            if not self._inner.called_functions:
+                self._on_done("".join(self._content))
+            raise
+
+        for choice in chunk.choices:
+            if choice.delta.content:
+                self._content.append(choice.delta.content)
+        return chunk
+
+    async def aclose(self, wait: bool = True) -> None:
+        await self._inner.aclose(wait=wait)
+
+
+class AnswerCacheLLM(llm.LLM):
+    """Answer the questions already answered for the persona without the LLM.
+
+    The questions the LLM answered (without calling functions) are recorded
+    with their answer and the previous question of the user, shared by every
+    session of the persona until its definition changes. A question matching
+    one asked min_seen times, with a confidence of min_confidence (share of the
+    important words found in both, for the question and the previous one),
+    gets the recorded answer at once. Follow-ups like "and how much is it?"
+    only match when asked after the same question.
+    """
+
+    def __init__(
+        self,
+        inner: llm.LLM,
+        persona,
+        *,
+        store: AnswerStore | None = None,
+        min_confidence: float = 0.85,
+        min_seen: int = 2,
+        min_terms: int = 2,
+    ) -> None:
+        self._inner = inner
+        self._persona = persona.name
+        self._language = persona.language
+        self._fingerprint = persona_fingerprint(persona)
+        self._store = store or AnswerStore()
+        self._min_confidence = min_confidence
+        self._min_seen = min_seen
+        self._min_terms = min_terms
+        self._index: AnswerIndex | None = None
+        self._version: int | None = None
+        self._stats: Counter = Counter()
+        self._tasks: set[asyncio.Task] = set()
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(
+                "failed to update the answer cache", exc_info=task.exception()
+            )
+
+    def _current_index(self) -> AnswerIndex:
+        version = self._store.version()
+        if self._index is None or version != self._version:
+            entries = self._store.load(self._persona, self._fingerprint, self._language)
+            self._index = AnswerIndex(entries)
+            self._version = self._store.version()
+        return self._index
+
+    async def _record(
+        self, question: str, answer: str, same_as: int | None, context: str
+    ) -> None:
+        try:
+            await asyncio.to_thread(
+                self._store.record,
+                self._persona,
+                self._fingerprint,
+                self._language,
+                question,
+                answer,
+                same_as,
+                context,
+            )
+        finally:
+            # data_version only changes with the commits of the other sessions
+            self._index = None
+
+    async def chat(
+        self,
+        history: ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        last = history.messages[-1] if history.messages else None
+        query: Counter = Counter()
+        if last is not None and last.role == ChatRole.USER and not last.images:
+            query = Counter(terms(last.text, self._language))
+
+        asked = [m for m in history.messages[:-1] if m.role == ChatRole.USER]
+        context = asked[-1].text if asked else ""
+        context_terms = Counter(terms(context, self._language))
+        if asked and (asked[-1].images or len(context_terms) < self._min_terms):
+            # after "yes" or a picture, what the question refers to isn't known
+            query = Counter()
+
+        index = None
+        if len(query) >= self._min_terms:
+            try:
+                index = await asyncio.to_thread(self._current_index)
+            except sqlite3.Error:
+                logging.exception("answer cache unavailable")
+
+        if index is None:
+            return await self._inner.chat(
+                history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+            )
+
+        question = last.text
+        entry, confidence = index.best(query, context_terms)
+        matched = entry is not None and confidence >= self._min_confidence
+        if matched and entry.seen >= self._min_seen:
+            self._stats["hits"] += 1
+            logging.info(
+                "answering %r from the cache (%r, confidence %.2f)",
+                question,
+                entry.question,
+                confidence,
+            )
+            self._spawn(asyncio.to_thread(self._store.served, entry.id))
+            return _CachedAnswerStream(entry.answer)
+
+        self._stats["misses"] += 1
+        same_as = entry.id if matched else None
+
+        def record(answer: str) -> None:
+            if not answer.strip():
+                return
+
+            self._stats["recorded"] += 1
+            self._spawn(self._record(question, answer, same_as, context))
+
+        stream = await self._inner.chat(
+            history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+        )
+        return _RecordingStream(stream, record)
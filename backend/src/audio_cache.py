@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import mmap
+import os
+import pathlib
+import tempfile
+from typing import Dict
+
+from livekit import rtc
+from livekit.agents import tts
+
+# where the pre-rendered phrases are stored, see prerender_audio.py
+AUDIO_CACHE_DIR_ENV = "AUDIO_CACHE_DIR"
+DEFAULT_AUDIO_CACHE_DIR = pathlib.Path(__file__).resolve().parents[1] / "audio_cache"
+
+# length of the frames played from the cache
+FRAME_DURATION = 0.1
+
+
+def phrase_key(text: str, voice: str, sample_rate: int) -> str:
+    raw = f"{voice}\0{sample_rate}\0{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Disk cache of synthesized phrases, stored as raw 16 bits mono PCM.
+
+    Files are memory-mapped when the cache is loaded, the worker loads it before
+    forking so every session shares the same pages.
+    """
+
+    def __init__(self, directory: str | os.PathLike | None = None) -> None:
+        if directory is None:
+            directory = os.environ.get(AUDIO_CACHE_DIR_ENV, DEFAULT_AUDIO_CACHE_DIR)
+
+        self._directory = pathlib.Path(directory)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._loaded = False
+
+    @property
+    def directory(self) -> pathlib.Path:
+        return self._directory
+
+    def load(self) -> None:
+        self._loaded = True
+        if not self._directory.is_dir():
+            logging.info("no pre-rendered audio in %s", self._directory)
+            return
+
+        for path in self._directory.glob("*.pcm"):
+            self._map(path)
+
+        logging.info("loaded %d pre-rendered phrases", len(self._maps))
+
+    def get(self, text: str, voice: str, sample_rate: int) -> memoryview | None:
+        if not self._loaded:
+            self.load()
+
+        pcm = self._maps.get(phrase_key(text, voice, sample_rate))
+        if pcm is None:
+            return None
+
+        return memoryview(pcm)
+
+    def put(self, text: str, voice: str, sample_rate: int, pcm: bytes) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._directory / f"{phrase_key(text, voice, sample_rate)}.pcm"
+        # write then rename, running workers never map a half written file
+        with tempfile.NamedTemporaryFile(dir=self._directory, delete=False) as f:
+            f.write(pcm)
+        os.replace(f.name, path)
+        self._map(path)
+
+    def _map(self, path: pathlib.Path) -> None:
+        if path.stat().st_size == 0:
+            return
+
+        with open(path, "rb") as f:
+            self._maps[path.stem] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CachedChunkedStream(tts.ChunkedStream):
+    def __init__(self, text: str, pcm: memoryview, sample_rate: int) -> None:
+        self._text = text
+        self._pcm = pcm
+        self._sample_rate = sample_rate
+        self._offset = 0
+        self._frame_bytes = int(sample_rate * FRAME_DURATION) * 2
+
+    async def __anext__(self) -> tts.SynthesizedAudio:
+        if self._offset >= len(self._pcm):
+            raise StopAsyncIteration
+
+        chunk = self._pcm[self._offset : self._offset + self._frame_bytes]
+        self._offset += len(chunk)
+        frame = rtc.AudioFrame(
+            data=chunk,
+            sample_rate=self._sample_rate,
+            num_channels=1,
+            samples_per_channel=len(chunk) // 2,
+        )
+        return tts.SynthesizedAudio(text=self._text, data=frame)
+
+    async def aclose(self) -> None:
+        self._offset = len(self._pcm)
+
+
+class CachedTTS(tts.TTS):
+    """TTS playing pre-rendered phrases from the cache, other text goes to inner."""
+
+    def __init__(self, inner: tts.TTS, *, voice: str, cache: AudioCache) -> None:
+        super().__init__(
+            streaming_supported=inner.streaming_supported,
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        self._inner = inner
+        self._voice = voice
+        self._cache = cache
+
+    def synthesize(self, text: str) -> tts.ChunkedStream:
+        if self.num_channels == 1:
+            pcm = self._cache.get(text, self._voice, self.sample_rate)
+            if pcm is not None:
+                logging.debug("playing pre-rendered audio for %r", text[:40])
+                return CachedChunkedStream(text, pcm, self.sample_rate)
+
+        return self._inner.synthesize(text)
+
+    def stream(self) -> tts.SynthesizeStream:
+        return self._inner.stream()
+
+
+cache = AudioCache()
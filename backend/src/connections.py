@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+import aiohttp
+import httpx
+
+import metrics
+
+# installed with httpx[http2], HTTP/1.1 without it
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# idle connections are closed after this long, the providers drop them after ~90s
+KEEPALIVE_EXPIRY = float(os.environ.get("CONNECTION_KEEPALIVE", 60.0))
+# connections per provider
+MAX_CONNECTIONS = int(os.environ.get("CONNECTION_LIMIT", 8))
+# idle providers get a request this often, their connection stays open
+HEALTH_CHECK_INTERVAL = float(os.environ.get("CONNECTION_HEALTH_CHECK", 30.0))
+# and at most this many, the session's own requests keep it open afterwards
+MAX_HEALTH_CHECKS = int(os.environ.get("CONNECTION_HEALTH_CHECKS", 4))
+# set to 0 to connect on the first request instead (offline benchmarks)
+PREWARM_ENV = "CONNECTION_PREWARM"
+
+OPENAI_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# providers reached over plain HTTP, deepgram streams over a websocket opened
+# with the session
+HTTP_PROVIDERS = ("openai_llm", "openai_tts")
+
+
+@dataclass
+class ProviderStats:
+    requests: int = 0
+    # connections opened by the requests, and the time they waited for them
+    connects: int = 0
+    connect_s: float = 0.0
+    # connections opened ahead of the requests
+    prewarm_connects: int = 0
+    prewarm_s: float = 0.0
+    health_failures: int = 0
+
+
+class _TracedTransport(httpx.AsyncHTTPTransport):
+    """Report the connection setup time of the requests it sends."""
+
+    def __init__(self, on_connect, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._on_connect = on_connect
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        prewarm = bool(request.extensions.pop("prewarm", False))
+        started = None
+
+        async def trace(event: str, info: dict) -> None:
+            # a new connection: connect_tcp, start_tls, then the request is sent
+            nonlocal started
+            if event == "connection.connect_tcp.started":
+                started = time.perf_counter()
+            elif started is not None and not event.startswith("connection."):
+                self._on_connect(time.perf_counter() - started, prewarm)
+                started = None
+
+        request.extensions["trace"] = trace
+        return await super().handle_async_request(request)
+
+
+class ConnectionPool:
+    """Keep-alive connections to the providers, shared by the clients of the process.
+
+    Each job process runs one session: its LLM, TTS and STT clients share the
+    pool, which connects to the providers as the session starts (prewarm) and
+    keeps the connections open with a request on the providers the session
+    hasn't used yet, so the first turns don't wait for DNS, TCP and TLS. HTTP/2
+    is used for the LLM (httpx[http2] in the requirements).
+    """
+
+    def __init__(self) -> None:
+        self._persona: str | None = None
+        self._llm_client: httpx.AsyncClient | None = None
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._stats = {p: ProviderStats() for p in metrics.PROVIDERS}
+        self._tasks: list[asyncio.Task] = []
+
+    def llm_http_client(self) -> httpx.AsyncClient:
+        """HTTP client for the OpenAI SDK (openai.AsyncClient(http_client=...))."""
+        if self._llm_client is None:
+            transport = _TracedTransport(
+                lambda seconds, prewarm: self._on_connect(
+                    "openai_llm", seconds, prewarm
+                ),
+                http2=HTTP2,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._llm_client = httpx.AsyncClient(
+                transport=transport,
+                follow_redirects=True,
+                event_hooks={"request": [self._on_llm_request]},
+            )
+
+        return self._llm_client
+
+    def tts_session(self) -> aiohttp.ClientSession:
+        return self._session("openai_tts")
+
+    def stt_session(self) -> aiohttp.ClientSession:
+        return self._session("deepgram")
+
+    def start(self, persona: str) -> None:
+        """Connect to the providers and keep the connections open, in the background."""
+        self._persona = persona
+        if os.environ.get(PREWARM_ENV, "1") == "0":
+            return
+
+        self._tasks.append(asyncio.create_task(self._keep_warm()))
+
+    def stats(self) -> dict:
+        return {
+            provider: asdict(stats)
+            for provider, stats in self._stats.items()
+            if stats.requests or stats.connects or stats.prewarm_connects
+        }
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._llm_client is not None:
+            await self._llm_client.aclose()
+        for session in self._sessions.values():
+            await session.close()
+
+    def _session(self, provider: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(provider)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=MAX_CONNECTIONS,
+                keepalive_timeout=KEEPALIVE_EXPIRY,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self._trace_config(provider)]
+            )
+            self._sessions[provider] = session
+
+        return session
+
+    def _trace_config(self, provider: str) -> aiohttp.TraceConfig:
+        config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params) -> None:
+            if not ctx.trace_request_ctx:
+                self._stats[provider].requests += 1
+
+        async def on_connection_create_start(session, ctx, params) -> None:
+            ctx.connect_started = time.perf_counter()
+
+        async def on_connection_create_end(session, ctx, params) -> None:
+            seconds = time.perf_counter() - ctx.connect_started
+            self._on_connect(provider, seconds, bool(ctx.trace_request_ctx))
+
+        config.on_request_start.append(on_request_start)
+        config.on_connection_create_start.append(on_connection_create_start)
+        config.on_connection_create_end.append(on_connection_create_end)
+        return config
+
+    async def _on_llm_request(self, request: httpx.Request) -> None:
+        if not request.extensions.get("prewarm"):
+            self._stats["openai_llm"].requests += 1
+
+    def _on_connect(self, provider: str, seconds: float, prewarm: bool) -> None:
+        stats = self._stats[provider]
+        if prewarm:
+            stats.prewarm_connects += 1
+            stats.prewarm_s += seconds
+            histograms = metrics.prewarm_histograms
+        else:
+            stats.connects += 1
+            stats.connect_s += seconds
+            histograms = metrics.connect_histograms
+
+        if histograms is not None and self._persona is not None:
+            histograms.observe(self._persona, provider, seconds)
+
+    async def _ping(self, provider: str) -> None:
+        # any answer will do (401 included), the request isn't authenticated; the
+        # TTS posts to {OPENAI_URL}/audio/speech, on the same host as the LLM
+        url = f"{OPENAI_URL}/models"
+        try:
+            if provider == "openai_llm":
+                await self.llm_http_client().head(url, extensions={"prewarm": True})
+            else:
+                async with self._session(provider).head(
+                    url, trace_request_ctx={"prewarm": True}
+                ):
+                    pass
+        except Exception as e:
+            self._stats[provider].health_failures += 1
+            logging.warning("%s connection check failed: %r", provider, e)
+
+    async def _keep_warm(self) -> None:
+        for _ in range(MAX_HEALTH_CHECKS):
+            idle = [p for p in HTTP_PROVIDERS if not self._stats[p].requests]
+            if not idle:
+                return
+
+            await asyncio.gather(*(self._ping(provider) for provider in idle))
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+
+pool = ConnectionPool()
@@ -1,184 +1,17 @@
-import asyncio
-import copy
 import logging
-from collections import deque
-from typing import Annotated, List
 
-from livekit import agents, rtc
-from livekit.agents import JobContext, JobRequest, WorkerOptions, cli, tokenize, tts
-from livekit.agents.llm import (
-    ChatContext,
-    ChatMessage,
-    ChatRole,
-)
-from livekit.agents.voice_assistant import AssistantContext, VoiceAssistant
-from livekit.plugins import deepgram, openai, silero#, elebenlabs
 from dotenv import load_dotenv
-import os
-import logging
+
+import worker
 from logging_config import setup_logging
 
 load_dotenv()
 
-
-MAX_IMAGES = 3
-NO_IMAGE_MESSAGE_GENERIC = (
-    "Lo siento, no tengo imagen para procesar, parece que algo está mal con la cámara."
-)
-
-class AssistantFnc(agents.llm.FunctionContext):
-    @agents.llm.ai_callable(
-        desc='''
-        Se llama cuando se le pide que evalúe algo que requiera capacidades visuales.
-        Se llama cuando se le pide que vea, observe, mire.
-        Se llama cuando se le pide que use la cámara.
-        '''
-    )
-    async def image(
-        self,
-        user_msg: Annotated[
-            str,
-            agents.llm.TypeInfo(desc="El mensaje de usuario que activó esta función"),
-        ],
-    ):
-        ctx = AssistantContext.get_current()
-        ctx.store_metadata("user_msg", user_msg)
-
-async def get_human_video_track(room: rtc.Room):
-    track_future = asyncio.Future[rtc.RemoteVideoTrack]()
-
-    def on_sub(track: rtc.Track, *_):
-        if isinstance(track, rtc.RemoteVideoTrack):
-            track_future.set_result(track)
-
-    room.on("track_subscribed", on_sub)
-
-    remote_video_tracks: List[rtc.RemoteVideoTrack] = []
-    for _, p in room.participants.items():
-        for _, t_pub in p.tracks.items():
-            if t_pub.track is not None and isinstance(
-                t_pub.track, rtc.RemoteVideoTrack
-            ):
-                remote_video_tracks.append(t_pub.track)
-
-    if len(remote_video_tracks) > 0:
-        track_future.set_result(remote_video_tracks[0])
-
-    video_track = await track_future
-    room.off("track_subscribed", on_sub)
-    return video_track
-
-async def entrypoint(ctx: JobContext):
-    sip = ctx.room.name.startswith("sip")
-    initial_ctx = ChatContext(
-        messages=[
-            ChatMessage(
-                role=ChatRole.SYSTEM,
-                text=(
-                    '''
-                    Tu nombre es David, eres el conserje de un edificio residencial.\
-                    Tu interfaz con los usuarios será voz y visión.\
-                    Tu mision es ofrecer informacion sobre el edificio y las familias que lo habitan.\
-                    Actualmente viven 4 familias en el edificio. Los García, los Rodríguez, los González y los Fernández, compuesta por:\
-                    José García\
-                    María García\
-                    Antonio Rodríguez\
-                    Carmen Rodríguez\
-                    Manuel González\
-                    Ana González\
-                    Francisco Fernández\
-                    Isabel Fernández\
-                    Actualmente la familia García y la familia Rodríguez se encuentran en el edificio.\
-                    Ni la familia González ni la familia Fernández se encuentran.\
-                    Debes atender a los visitantes cuando quieran hablar con alguna de estas personas, si se encuentran les comumicas que en breve les avisas y serán atendidos,\
-                    si no se encuentran educadamente di que no estan en el edificio, y que pueden dejar un mensaje para ellos.\
-                    Debes utilizar respuestas breves y concisas, y evitar el uso de puntuación impronunciable y emojis.\
-                    Responde siempre en español.\
-                    '''
-                ),
-            )
-        ]
-    )
-
-    gpt = openai.LLM(
-        model="gpt-4o",
-    )
-    openai_tts = tts.StreamAdapter(
-        tts=openai.TTS(voice="alloy"),
-        sentence_tokenizer=tokenize.basic.SentenceTokenizer(),
-    )
-    latest_image: rtc.VideoFrame | None = None
-    img_msg_queue: deque[agents.llm.ChatMessage] = deque()
-    assistant = VoiceAssistant(
-        vad=silero.VAD(),
-        stt=deepgram.STT(model= "nova-2-general", language= "es"),
-        llm=gpt,
-        #tts=elevenlabs.TTS(encoding="pcm_44100"),
-        tts=openai_tts,
-        fnc_ctx=None if sip else AssistantFnc(),
-        chat_ctx=initial_ctx,
-    )
-
-    chat = rtc.ChatManager(ctx.room)
-
-    async def _answer_from_text(text: str):
-        chat_ctx = copy.deepcopy(assistant.chat_context)
-        chat_ctx.messages.append(ChatMessage(role=ChatRole.USER, text=text))
-
-        stream = await gpt.chat(chat_ctx)
-        await assistant.say(stream)
-
-    @chat.on("message_received")
-    def on_chat_received(msg: rtc.ChatMessage):
-        if not msg.message:
-            return
-
-        asyncio.create_task(_answer_from_text(msg.message))
-    
-    async def respond_to_image(user_msg: str):
-        nonlocal latest_image, img_msg_queue, initial_ctx
-        if not latest_image:
-            await assistant.say(NO_IMAGE_MESSAGE_GENERIC)
-            return
-    
-        initial_ctx.messages.append(
-            agents.llm.ChatMessage(
-                role=agents.llm.ChatRole.USER,
-                text=user_msg,
-                images=[agents.llm.ChatImage(image=latest_image)],
-            )
-        )
-        img_msg_queue.append(initial_ctx.messages[-1])
-        if len(img_msg_queue) >= MAX_IMAGES:
-            msg = img_msg_queue.popleft()
-            msg.images = []
-
-        stream = await gpt.chat(initial_ctx)
-        await assistant.say(stream, allow_interruptions=True)
-    
-    @assistant.on("function_calls_finished")
-    def _function_calls_done(ctx: AssistantContext):
-        user_msg = ctx.get_metadata("user_msg")
-        if not user_msg:
-            return
-        asyncio.ensure_future(respond_to_image(user_msg))
-
-    assistant.start(ctx.room)
-
-    await asyncio.sleep(0.5)
-    await assistant.say("Hola, como puedo ayudarte?", allow_interruptions=True)
-    while ctx.room.connection_state == rtc.ConnectionState.CONN_CONNECTED:
-        video_track = await get_human_video_track(ctx.room)
-        async for event in rtc.VideoStream(video_track):
-            latest_image = event.frame
-
-
-async def request_fnc(req: JobRequest) -> None:
-    logging.info("received request %s", req)
-    await req.accept(entrypoint)
+# defined by personas/conserje.json, edits are picked up by the running worker
+PERSONA_NAME = "conserje"
 
 
 if __name__ == "__main__":
     setup_logging()
     logging.info("Agent2 started")
-    cli.run_app(WorkerOptions(request_fnc))
\ No newline at end of file
+    worker.run(default_persona=PERSONA_NAME)
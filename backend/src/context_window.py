@@ -0,0 +1,225 @@
+import functools
+import logging
+from typing import List
+
+from livekit.agents import llm
+from livekit.agents.llm import ChatContext, ChatMessage, ChatRole
+
+# per message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# what OpenAI charges for one image at each detail level (512px tiles for "high")
+LOW_DETAIL_IMAGE_TOKENS = 85
+HIGH_DETAIL_IMAGE_TOKENS = 765
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the following conversation in a few sentences, in the language it "
+    "is written in. Keep names, facts, numbers and decisions, drop small talk."
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _encoding(model: str):
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # unknown model, or the BPE file can't be downloaded (offline boxes)
+        logging.warning("tiktoken unavailable for %s, estimating token counts", model)
+        return None
+
+
+# messages are shared between the context and its per-request copies, the text
+# objects are the same so their hash is cached and lookups stay cheap
+@functools.lru_cache(maxsize=4096)
+def count_text_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_image_tokens(image: llm.ChatImage) -> int:
+    if max(image.inference_width or 0, image.inference_height or 0) > 512:
+        return HIGH_DETAIL_IMAGE_TOKENS
+
+    return LOW_DETAIL_IMAGE_TOKENS
+
+
+class SnapshotChatContext(ChatContext):
+    """Chat context whose copies share the message objects.
+
+    Copying only copies the list of references: it still grows with the number
+    of messages, but no longer with their size (long prompts, images), which
+    ChatContext.copy() copies one by one. Messages must be treated as
+    immutable: to change one, swap it with replace_message() and earlier
+    snapshots keep the original.
+    """
+
+    def copy(self) -> "SnapshotChatContext":
+        return SnapshotChatContext(messages=list(self.messages))
+
+
+def replace_message(chat_ctx: ChatContext, old: ChatMessage, new: ChatMessage) -> bool:
+    for i, msg in enumerate(chat_ctx.messages):
+        if msg is old:
+            chat_ctx.messages[i] = new
+            return True
+
+    return False
+
+
+class ContextWindow:
+    """Keep a chat context under a token budget.
+
+    The first message (the system prompt) and the last keep_last messages are
+    never evicted. Older turns are dropped oldest first and, when an LLM is given
+    to compact(), folded into a summary kept right after the system prompt.
+
+    Once over the budget, turns are evicted down to evict_to of it at once: the
+    requests of the next turns then start with the same messages, which the
+    provider serves from its prompt cache.
+    """
+
+    def __init__(
+        self,
+        chat_ctx: ChatContext,
+        *,
+        max_tokens: int,
+        keep_last: int = 6,
+        evict_to: float = 0.75,
+        model: str = "gpt-4o",
+    ) -> None:
+        self._chat_ctx = chat_ctx
+        self._max_tokens = max_tokens
+        self._evict_to = evict_to
+        self._keep_last = keep_last
+        self._model = model
+        self._evicted: List[ChatMessage] = []
+        self._summary: ChatMessage | None = None
+        self._compacting = False
+
+    @property
+    def max_tokens(self) -> int:
+        return self._max_tokens
+
+    def count(self, msg: ChatMessage) -> int:
+        tokens = MESSAGE_OVERHEAD_TOKENS + count_text_tokens(msg.text, self._model)
+        return tokens + sum(count_image_tokens(image) for image in msg.images)
+
+    def total(self, chat_ctx: ChatContext) -> int:
+        return sum(self.count(msg) for msg in chat_ctx.messages)
+
+    def fit(self, chat_ctx: ChatContext | None = None) -> int:
+        """Evict old turns (in place) until the context fits, return its token count.
+
+        chat_ctx defaults to the managed context, copies of it made for a single
+        request can be fitted too.
+        """
+        if chat_ctx is None:
+            chat_ctx = self._chat_ctx
+
+        total = self.total(chat_ctx)
+        messages = chat_ctx.messages
+        first = self._first_evictable(chat_ctx)
+        target = self._max_tokens
+        if total > self._max_tokens:
+            target = self._max_tokens * self._evict_to
+        while total > target and len(messages) - first > self._keep_last:
+            msg = messages.pop(first)
+            total -= self.count(msg)
+            if chat_ctx is self._chat_ctx:
+                self._evicted.append(msg)
+
+        if total > self._max_tokens:
+            logging.warning(
+                "chat context is %d tokens, over the %d budget even after eviction",
+                total,
+                self._max_tokens,
+            )
+
+        return total
+
+    def report(self, chat_ctx: ChatContext, label: str) -> int:
+        tokens = self.total(chat_ctx)
+        logging.info(
+            "%s request: %d prompt tokens in %d messages (budget %d)",
+            label,
+            tokens,
+            len(chat_ctx.messages),
+            self._max_tokens,
+        )
+        return tokens
+
+    async def compact(self, summarizer: llm.LLM) -> None:
+        """Fold the turns evicted so far into the summary message."""
+        if self._compacting or not self._evicted:
+            return
+
+        self._compacting = True
+        evicted, self._evicted = self._evicted, []
+        try:
+            lines = []
+            if self._summary is not None:
+                lines.append(self._summary.text)
+            lines.extend(f"{msg.role.value}: {msg.text}" for msg in evicted)
+
+            request = ChatContext(
+                messages=[
+                    ChatMessage(role=ChatRole.SYSTEM, text=SUMMARY_INSTRUCTIONS),
+                    ChatMessage(role=ChatRole.USER, text="\n".join(lines)),
+                ]
+            )
+            stream = await summarizer.chat(request)
+            chunks = []
+            async for chunk in stream:
+                if chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+            await stream.aclose()
+
+            summary = ChatMessage(role=ChatRole.SYSTEM, text="".join(chunks))
+            messages = self._chat_ctx.messages
+            if self._summary is not None and self._summary in messages:
+                messages.remove(self._summary)
+            messages.insert(1, summary)
+            self._summary = summary
+            logging.info(
+                "compacted %d turns into a %d tokens summary",
+                len(evicted),
+                self.count(summary),
+            )
+        except Exception:
+            logging.exception("failed to compact the chat context")
+        finally:
+            self._compacting = False
+
+    def _first_evictable(self, chat_ctx: ChatContext) -> int:
+        # the summary is the only other system message, right after the prompt
+        messages = chat_ctx.messages
+        if len(messages) > 1 and messages[1].role == ChatRole.SYSTEM:
+            return 2
+
+        return 1
+
+
+class BudgetedLLM(llm.LLM):
+    """LLM wrapper fitting every request into the window and logging its size."""
+
+    def __init__(self, inner: llm.LLM, window: ContextWindow, *, label: str) -> None:
+        self._inner = inner
+        self._window = window
+        self._label = label
+
+    async def chat(
+        self,
+        history: ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        self._window.fit(history)
+        self._window.report(history, self._label)
+        return await self._inner.chat(
+            history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+        )
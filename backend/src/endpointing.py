@@ -0,0 +1,157 @@
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass
+
+from livekit.agents import vad
+
+# a turn ending with one of these words is very likely not over
+CONTINUATION_WORDS = {
+    "en": {
+        "and", "but", "so", "because", "or", "then", "if", "like", "um", "uh",
+        "the", "a", "an", "to", "of", "with", "for", "my",
+    },
+    "fr": {
+        "et", "mais", "donc", "parce", "que", "ou", "alors", "si", "euh", "ben",
+        "le", "la", "les", "un", "une", "de", "des", "du", "avec", "pour", "mon",
+    },
+    "es": {
+        "y", "pero", "entonces", "porque", "que", "o", "si", "eh", "este", "pues",
+        "el", "la", "los", "las", "un", "una", "de", "del", "con", "para", "mi",
+    },
+}
+
+
+@dataclass(frozen=True)
+class EndpointingPolicy:
+    """How long a silence must last before the user's turn is considered over."""
+
+    min_delay: float = 0.4
+    max_delay: float = 1.6
+    initial_delay: float = 0.8
+    # the delay covers this quantile of the user's pauses inside a turn, plus margin
+    quantile: float = 0.9
+    margin: float = 1.2
+    # shorter silences are gaps between words, not pauses
+    min_pause: float = 0.15
+    # the turn seems unfinished (trailing "and", "euh", ...)
+    continuation_factor: float = 1.6
+    # the transcript ends with a question or a full stop
+    question_factor: float = 0.7
+    statement_factor: float = 0.85
+    # speech resuming this soon after an end of turn means the user was cut off
+    cutoff_window: float = 1.0
+
+
+class Endpointer:
+    """Learn the user's pauses and derive the end-of-turn silence delay."""
+
+    def __init__(self, policy: EndpointingPolicy, language: str = "en") -> None:
+        self._policy = policy
+        self._continuation = CONTINUATION_WORDS.get(language[:2].lower(), set())
+        self._pauses: deque[float] = deque(maxlen=30)
+        self._cue_factor = 1.0
+        self.cutoffs = 0
+
+    @property
+    def base_delay(self) -> float:
+        if len(self._pauses) < 5:
+            return self._policy.initial_delay
+
+        pauses = sorted(self._pauses)
+        index = min(int(len(pauses) * self._policy.quantile), len(pauses) - 1)
+        return pauses[index] * self._policy.margin
+
+    @property
+    def delay(self) -> float:
+        delay = self.base_delay * self._cue_factor
+        return min(max(delay, self._policy.min_delay), self._policy.max_delay)
+
+    def on_pause(self, duration: float) -> None:
+        """A silence inside the turn, the user kept speaking after it."""
+        if duration >= self._policy.min_pause:
+            self._pauses.append(duration)
+
+    def on_resumed_after_end(self, pause: float, delay: float) -> None:
+        """The user spoke again after a pause that ended the turn (with delay)."""
+        if pause - delay <= self._policy.cutoff_window:
+            self.cutoffs += 1
+            self._pauses.append(pause)
+
+    def on_transcript(self, text: str) -> None:
+        text = text.strip()
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            self._cue_factor = 1.0
+        elif words[-1] in self._continuation and not text.endswith(("?", "!", ".")):
+            self._cue_factor = self._policy.continuation_factor
+        elif text.endswith("?"):
+            self._cue_factor = self._policy.question_factor
+        elif text.endswith((".", "!")):
+            self._cue_factor = self._policy.statement_factor
+        else:
+            self._cue_factor = 1.0
+
+
+class AdaptiveVAD(vad.VAD):
+    """VAD whose end-of-speech silence follows an Endpointer."""
+
+    def __init__(self, inner: vad.VAD, endpointer: Endpointer) -> None:
+        self._inner = inner
+        self._endpointer = endpointer
+
+    def stream(self, **kwargs) -> vad.VADStream:
+        kwargs.setdefault("min_silence_duration", self._endpointer.delay)
+        return _AdaptiveVADStream(self._inner.stream(**kwargs), self._endpointer)
+
+
+class _AdaptiveVADStream(vad.VADStream):
+    def __init__(self, inner: vad.VADStream, endpointer: Endpointer) -> None:
+        self._inner = inner
+        self._endpointer = endpointer
+        self._sample_rate = getattr(inner, "_sample_rate", 16000)
+        self._threshold = getattr(inner, "_threshold", 0.5)
+        self._speaking = False
+        self._silence_start: int | None = None
+        self._last_end: int | None = None
+        self._last_delay = endpointer.delay
+        if not hasattr(inner, "_min_silence_samples"):
+            logging.warning("%s can't adapt its silence duration", type(inner).__name__)
+
+    def push_frame(self, frame) -> None:
+        self._inner.push_frame(frame)
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        await self._inner.aclose(wait=wait)
+
+    async def __anext__(self) -> vad.VADEvent:
+        event = await self._inner.__anext__()
+        if event.type == vad.VADEventType.START_OF_SPEECH:
+            self._speaking = True
+            self._silence_start = None
+            if self._last_end is not None:
+                # END_OF_SPEECH is indexed at the start of the silence
+                pause = (event.samples_index - self._last_end) / self._sample_rate
+                self._endpointer.on_resumed_after_end(pause, self._last_delay)
+                self._last_end = None
+        elif event.type == vad.VADEventType.END_OF_SPEECH:
+            self._speaking = False
+            self._silence_start = None
+            self._last_end = event.samples_index
+            self._last_delay = self._endpointer.delay
+        elif self._speaking:
+            if event.probability < self._threshold:
+                if self._silence_start is None:
+                    self._silence_start = event.samples_index
+            elif self._silence_start is not None:
+                pause = event.samples_index - self._silence_start
+                self._endpointer.on_pause(pause / self._sample_rate)
+                self._silence_start = None
+
+        self._apply()
+        return event
+
+    def _apply(self) -> None:
+        if hasattr(self._inner, "_min_silence_samples"):
+            delay = self._endpointer.delay
+            self._inner._min_silence_samples = delay * self._sample_rate
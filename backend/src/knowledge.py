@@ -0,0 +1,258 @@
+import argparse
+import functools
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from livekit.agents import llm
+from livekit.agents.llm import ChatContext, ChatMessage, ChatRole
+
+from context_window import count_text_tokens
+from lexical import BM25, terms
+
+# passages are cut at paragraphs, up to this size
+MAX_PASSAGE_TOKENS = 200
+# weight of the previous user message in the query, for follow-up questions
+PREVIOUS_TURN_WEIGHT = 0.5
+
+KNOWLEDGE_HEADER = "Passages of your reference documents relevant to the question:"
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+# "[3] https://..." lines of a citations list, and the "[3]" marks of the text
+_CITATION = re.compile(r"^\[(\d+)\]\s+(\S+)\s*$")
+_CITATION_MARK = re.compile(r"\[(\d+)\]")
+_CITATIONS_TITLE = re.compile(r"^(citations|sources|references)\s*:?$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Passage:
+    title: str
+    text: str
+    tokens: int
+
+    def render(self) -> str:
+        return _render(self.title, self.text)
+
+
+def _render(title: str, text: str) -> str:
+    return f"### {title}\n{text}" if title else text
+
+
+def split_passages(
+    text: str, *, max_tokens: int = MAX_PASSAGE_TOKENS, model: str = "gpt-4o"
+) -> List[Passage]:
+    """Cut a markdown document into passages titled with their headings.
+
+    Paragraphs of a section are grouped up to max_tokens. A list of citations
+    ("[3] https://...") is not a passage: the URLs go with the passages citing
+    them.
+    """
+    citations: Dict[str, str] = {}
+    sections: List[Tuple[str, List[str]]] = []
+    headings: List[str] = []
+    paragraph: List[str] = []
+
+    def end_paragraph() -> None:
+        if paragraph:
+            if not sections:
+                sections.append(("", []))
+            sections[-1][1].append("\n".join(paragraph))
+            paragraph.clear()
+
+    for line in text.splitlines():
+        heading = _HEADING.match(line)
+        citation = _CITATION.match(line.strip())
+        if heading:
+            end_paragraph()
+            level = len(heading.group(1))
+            headings[level - 1 :] = [heading.group(2).strip()]
+            # the section and its parent, the document title would repeat everywhere
+            title = " > ".join([h for h in headings if h][-2:])
+            sections.append((title, []))
+        elif citation:
+            citations[citation.group(1)] = citation.group(2)
+        elif _CITATIONS_TITLE.match(line.strip()):
+            end_paragraph()
+        elif line.strip():
+            paragraph.append(line.rstrip())
+        else:
+            end_paragraph()
+    end_paragraph()
+
+    passages = []
+    for title, paragraphs in sections:
+        chunk: List[str] = []
+        size = 0
+        for paragraph_text in paragraphs:
+            tokens = count_text_tokens(paragraph_text, model)
+            if chunk and size + tokens > max_tokens:
+                passages.append(_passage(title, chunk, citations, model))
+                chunk, size = [], 0
+            chunk.append(paragraph_text)
+            size += tokens
+        if chunk:
+            passages.append(_passage(title, chunk, citations, model))
+
+    return passages
+
+
+def _passage(
+    title: str, paragraphs: List[str], citations: Dict[str, str], model: str
+) -> Passage:
+    text = "\n\n".join(paragraphs)
+    cited = dict.fromkeys(_CITATION_MARK.findall(text))
+    sources = [f"[{n}] {citations[n]}" for n in cited if n in citations]
+    if sources:
+        text += "\nSources: " + " ".join(sources)
+
+    return Passage(title, text, count_text_tokens(_render(title, text), model))
+
+
+class KnowledgeIndex:
+    """BM25 index of the passages of a persona's knowledge."""
+
+    def __init__(self, passages: List[Passage], language: str) -> None:
+        self.passages = passages
+        self.language = language
+        self.tokens = sum(p.tokens for p in passages)
+        self._bm25 = BM25(
+            [Counter(terms(f"{p.title}\n{p.text}", language)) for p in passages]
+        )
+
+    def search(self, query: Counter, k: int) -> List[Passage]:
+        """The k passages matching the query best, in the order of the document."""
+        found = sorted(i for _, i in self._bm25.top(query, k))
+        return [self.passages[i] for i in found]
+
+
+@functools.lru_cache(maxsize=32)
+def build_index(
+    text: str, language: str, model: str = "gpt-4o"
+) -> KnowledgeIndex | None:
+    """Index of a knowledge text, built once per text and shared by the sessions.
+
+    Built in the worker, before the job processes are forked, by index_for().
+    """
+    if not text.strip():
+        return None
+
+    return KnowledgeIndex(split_passages(text, model=model), language)
+
+
+def index_for(persona) -> KnowledgeIndex | None:
+    return build_index(persona.knowledge, persona.language, persona.llm_model)
+
+
+@dataclass
+class KnowledgeStats:
+    turns: int = 0
+    passages: int = 0
+    # tokens of the passages sent, and of the knowledge left out of the requests
+    injected_tokens: int = 0
+    saved_tokens: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "turns": self.turns,
+            "passages": self.passages,
+            "injected_tokens": self.injected_tokens,
+            "saved_tokens": self.saved_tokens,
+            "saved_tokens_per_turn": (
+                round(self.saved_tokens / self.turns) if self.turns else 0
+            ),
+        }
+
+
+class KnowledgeLLM(llm.LLM):
+    """Add the passages of the knowledge relevant to each question to the request.
+
+    The passages go in a system message right before the last user message:
+    the system prompt and the conversation keep the same bytes from one
+    request to the next (prompt cache), and the passages of a turn aren't
+    kept in the conversation.
+    """
+
+    def __init__(
+        self, inner: llm.LLM, index: KnowledgeIndex, *, passages: int = 4
+    ) -> None:
+        self._inner = inner
+        self._index = index
+        self._k = passages
+        self.stats = KnowledgeStats()
+
+    def _query(self, history: ChatContext) -> Counter:
+        query: Counter = Counter()
+        user_messages = [m for m in history.messages if m.role == ChatRole.USER]
+        for weight, msg in zip((1.0, PREVIOUS_TURN_WEIGHT), reversed(user_messages)):
+            for term in terms(msg.text, self._index.language):
+                query[term] = max(query[term], weight)
+        return query
+
+    async def chat(
+        self,
+        history: ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        messages = history.messages
+        if messages and messages[-1].role == ChatRole.USER:
+            found = self._index.search(self._query(history), self._k)
+            injected = sum(p.tokens for p in found)
+            self.stats.turns += 1
+            self.stats.passages += len(found)
+            self.stats.injected_tokens += injected
+            self.stats.saved_tokens += self._index.tokens - injected
+            logging.info(
+                "knowledge: %d of %d passages (%d tokens), %d prompt tokens saved",
+                len(found),
+                len(self._index.passages),
+                injected,
+                self._index.tokens - injected,
+            )
+            if found:
+                text = "\n\n".join([KNOWLEDGE_HEADER, *(p.render() for p in found)])
+                history = history.copy()
+                history.messages.insert(
+                    len(history.messages) - 1,
+                    ChatMessage(role=ChatRole.SYSTEM, text=text),
+                )
+
+        return await self._inner.chat(
+            history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+        )
+
+
+def main() -> None:
+    from persona import registry
+
+    parser = argparse.ArgumentParser(
+        description="Show how the knowledge of the personas is cut and retrieved"
+    )
+    parser.add_argument("persona", nargs="?", help="only this persona")
+    parser.add_argument("--query", help="show the passages retrieved for a question")
+    args = parser.parse_args()
+
+    for name, persona in sorted(registry.personas.items()):
+        if args.persona and name != args.persona:
+            continue
+
+        index = index_for(persona)
+        if index is None:
+            continue
+
+        print(f"{name}: {len(index.passages)} passages, {index.tokens} tokens")
+        passages = index.passages
+        if args.query:
+            query = Counter(terms(args.query, persona.language))
+            passages = index.search(query, persona.knowledge_passages)
+            injected = sum(p.tokens for p in passages)
+            print(f"  {injected} tokens sent, {index.tokens - injected} saved")
+        for passage in passages:
+            print(f"  {passage.tokens:4d}  {passage.title or '(untitled)'}")
+
+
+if __name__ == "__main__":
+    main()
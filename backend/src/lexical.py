@@ -0,0 +1,73 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Tuple
+
+# words that don't tell two questions apart, question words are kept
+STOPWORDS = {
+    "en": {
+        "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "i", "you",
+        "we", "it", "to", "of", "in", "on", "for", "and", "or", "me", "my", "your",
+        "can", "could", "please", "tell", "about", "this", "that", "there",
+    },
+    "fr": {
+        "le", "la", "les", "l", "un", "une", "des", "du", "de", "d", "et", "est",
+        "ce", "c", "ça", "je", "j", "tu", "vous", "nous", "il", "elle", "on", "se",
+        "s", "en", "y", "au", "aux", "à", "me", "m", "moi", "mon", "ma", "mes",
+        "votre", "vos", "pouvez", "pourriez", "dire", "svp", "plaît", "t",
+    },
+    "es": {
+        "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "y",
+        "es", "en", "a", "al", "me", "mi", "te", "tu", "se", "lo", "le", "usted",
+        "puede", "podría", "decir", "favor", "por",
+    },
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def terms(text: str, language: str) -> List[str]:
+    """The words of a text that matter to match it, lowercased."""
+    text = unicodedata.normalize("NFC", text.lower())
+    stopwords = STOPWORDS.get(language, set())
+    return [w for w in re.findall(r"\w+", text) if w not in stopwords]
+
+
+class BM25:
+    """BM25 scores of a query against a fixed set of documents (term counts)."""
+
+    def __init__(self, documents: List[Counter]) -> None:
+        self._documents = documents
+        lengths = [sum(d.values()) for d in documents]
+        self._avg_len = sum(lengths) / len(lengths) if lengths else 0.0
+        df: Counter = Counter()
+        for document in documents:
+            df.update(document.keys())
+        n = len(documents)
+        self._idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def idf(self, term: str) -> float:
+        n = len(self._documents)
+        return self._idf.get(term, math.log(1 + (n + 0.5) / 0.5))
+
+    def score(self, query: Counter, document: Counter) -> float:
+        length = sum(document.values())
+        score = 0.0
+        for term, weight in query.items():
+            tf = document.get(term, 0)
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self._avg_len or 1))
+                score += weight * self.idf(term) * tf * (BM25_K1 + 1) / (tf + norm)
+        return score
+
+    def top(self, query: Counter, k: int) -> List[Tuple[float, int]]:
+        """(score, index) of the k best documents, those sharing no term left out."""
+        scored = [(self.score(query, d), i) for i, d in enumerate(self._documents)]
+        scored = [(s, i) for s, i in scored if s > 0]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:k]
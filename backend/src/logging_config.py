@@ -1,18 +1,178 @@
-# /root/Live-Agent/backend/src/logging_config.py
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import multiprocessing as mp
 import os
+import pathlib
+import re
 import sys
+import time
+
+LOG_DIR = pathlib.Path(
+    os.environ.get("LOG_DIR", pathlib.Path(__file__).resolve().parents[1] / "logs")
+)
+LOG_FILE = os.environ.get("LOG_FILE", "agent.jsonl")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 50 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", 14))
+
+# fields of the session the records are logged for
+CONTEXT_FIELDS = ("room", "session", "persona", "turn")
+
+_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context")
+_queue_handler: logging.handlers.QueueHandler | None = None
+
+
+def bind(**fields) -> None:
+    """Add fields to the records of the current task and of the tasks it starts."""
+    _context.set({**_context.get({}), **fields})
+
+
+def update(**fields) -> None:
+    """Change bound fields, also for the tasks already started."""
+    context = _context.get(None)
+    if context is None:
+        bind(**fields)
+    else:
+        context.update(fields)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get({}).items():
+            setattr(record, key, value)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most burst records with the same message through every period."""
+
+    def __init__(self, burst: int = 20, period: float = 10.0) -> None:
+        super().__init__()
+        self._burst = burst
+        self._period = period
+        self._windows: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self._period:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            if len(self._windows) > 10000:
+                self._windows.clear()
+            self._windows[key] = [now, 1, 0]
+            return True
+
+        window[1] += 1
+        if window[1] <= self._burst:
+            return True
+
+        window[2] += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    EXTRA_FIELDS = (*CONTEXT_FIELDS, "job_id", "pid", "suppressed")
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in self.EXTRA_FIELDS:
+            if hasattr(record, key):
+                data[key] = getattr(record, key)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotate every night, and whenever the file grows past max_bytes."""
+
+    def __init__(self, filename, *, max_bytes: int, backup_count: int) -> None:
+        super().__init__(
+            filename, when="midnight", backupCount=backup_count, encoding="utf-8"
+        )
+        self.max_bytes = max_bytes
+        # several rotations a day need distinct names
+        self.suffix = "%Y-%m-%d_%H-%M-%S"
+        self.extMatch = re.compile(
+            r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(_\d+)?$", re.ASCII
+        )
+
+    def rotation_filename(self, default_name: str) -> str:
+        # named after the rotation time, not the start of the day
+        name = f"{self.baseFilename}.{time.strftime(self.suffix)}"
+        candidate, n = name, 0
+        while os.path.exists(candidate):
+            n += 1
+            candidate = f"{name}_{n}"
+        return candidate
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is not None and self.max_bytes > 0:
+            if self.stream.tell() >= self.max_bytes:
+                return True
+
+        return bool(super().shouldRollover(record))
+
 
 def setup_logging():
-    log_folder = "/root/Live-Agent/backend/logs"
-    os.makedirs(log_folder, exist_ok=True)
-    log_file = os.path.join(log_folder, "agent2.log")
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s %(levelname)s %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+    """Log to stdout and to rotating JSON files without blocking the event loops.
+
+    Records are put on a queue shared with the job processes (forked from this
+    one) and written by a thread of the worker.
+    """
+    global _queue_handler
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    file_handler = SizedTimedRotatingFileHandler(
+        LOG_DIR / LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS
     )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    )
+
+    records = mp.Queue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    _queue_handler.addFilter(ContextFilter())
+    _queue_handler.addFilter(RateLimitFilter())
+    listener = logging.handlers.QueueListener(
+        records, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(_queue_handler)
+
+    pid = os.getpid()
+    atexit.register(lambda: os.getpid() == pid and listener.stop())
+
+
+def setup_job_logging(**fields) -> None:
+    """In a job process: bind the session fields and only log through the queue.
+
+    The job process also forwards its records to the worker, which would log
+    them a second time, and synchronously.
+    """
+    bind(**fields)
+    if _queue_handler is None:
+        return
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for handler in list(root.handlers):
+        if handler is not _queue_handler:
+            root.removeHandler(handler)
@@ -0,0 +1,343 @@
+import bisect
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from livekit.agents import llm
+from livekit.agents.tts import (
+    TTS,
+    ChunkedStream,
+    SynthesisEvent,
+    SynthesisEventType,
+    SynthesizeStream,
+)
+
+# stages of a turn, timed from the end of the user's speech (VAD)
+STAGES = (
+    "stt_final",
+    "llm_request",
+    "llm_first_token",
+    "tts_first_byte",
+    "first_audio",
+    "turn_end",
+)
+BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+METRIC = "live_agent_turn_stage_seconds"
+HELP = "Time from the end of the user's speech to each stage of the turn."
+
+# connections to the providers, see connections.py
+PROVIDERS = ("openai_llm", "openai_tts", "deepgram")
+CONNECT_METRIC = "live_agent_connection_setup_seconds"
+CONNECT_HELP = "Connection setup (DNS, TCP, TLS) paid by requests of the sessions."
+PREWARM_METRIC = "live_agent_connection_prewarm_seconds"
+PREWARM_HELP = "Connection setup paid ahead of the requests, by the prewarming."
+
+
+class LatencyHistograms:
+    """Histograms of durations per persona and stage (of a turn by default).
+
+    They live in shared memory created before the job processes are forked,
+    every session observes into them and the worker serves them.
+    """
+
+    def __init__(
+        self,
+        persona_names: List[str],
+        spare: int = 16,
+        *,
+        stages: Tuple[str, ...] = STAGES,
+        label: str = "stage",
+        metric: str = METRIC,
+        description: str = HELP,
+    ) -> None:
+        self._names = list(persona_names)
+        self._stages = stages
+        self._label = label
+        self._metric = metric
+        self._description = description
+        # rows for the personas added while the worker runs
+        self._capacity = len(self._names) + spare
+        # per persona and stage: one count per bucket, +Inf, then the sum
+        self._width = len(BUCKETS) + 2
+        self._values = mp.Array("d", self._capacity * len(stages) * self._width)
+
+    def add_persona(self, name: str) -> None:
+        """Make room for a new persona, before forking its sessions."""
+        if name in self._names:
+            return
+
+        if len(self._names) >= self._capacity:
+            logging.warning("no room for the metrics of persona %s", name)
+            return
+
+        self._names.append(name)
+
+    def _offset(self, persona: str, stage: str) -> int:
+        stages = self._stages
+        row = self._names.index(persona) * len(stages) + stages.index(stage)
+        return row * self._width
+
+    def observe(self, persona: str, stage: str, seconds: float) -> None:
+        if persona not in self._names:
+            return
+
+        offset = self._offset(persona, stage)
+        with self._values.get_lock():
+            self._values[offset + bisect.bisect_left(BUCKETS, seconds)] += 1
+            self._values[offset + self._width - 1] += seconds
+
+    def render(self) -> str:
+        """The histograms in the Prometheus text format."""
+        with self._values.get_lock():
+            values = self._values[:]
+
+        metric = self._metric
+        lines = [
+            f"# HELP {metric} {self._description}",
+            f"# TYPE {metric} histogram",
+        ]
+        for persona in self._names:
+            for stage in self._stages:
+                offset = self._offset(persona, stage)
+                labels = f'persona="{persona}",{self._label}="{stage}"'
+                count = 0
+                for i, bound in enumerate((*BUCKETS, "+Inf")):
+                    count += int(values[offset + i])
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {values[offset + self._width - 1]}")
+                lines.append(f"{metric}_count{{{labels}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+class TurnTimeline:
+    """Stamp the stages of the user's turns and record them once played.
+
+    A turn starts when the user starts speaking and is timed from the end of
+    their speech. Once its audio starts playing the next turn can begin, the
+    played one ends when the agent stops speaking (or is interrupted).
+    """
+
+    def __init__(self, persona: str, histograms: LatencyHistograms | None) -> None:
+        self._persona = persona
+        self._histograms = histograms
+        self._current: Dict[str, float] = {}
+        self._playing: Dict[str, float] | None = None
+
+    @property
+    def turn(self) -> Dict[str, float]:
+        return self._current
+
+    def mark(self, stage: str, turn: Dict[str, float] | None = None) -> None:
+        """Stamp stage on the current turn, or on turn if the answer was started for it."""
+        if turn is None:
+            turn = self._current
+        turn.setdefault(stage, time.monotonic())
+
+    def on_user_started_speaking(self) -> None:
+        # the user kept talking, what was prepared for their last words is stale
+        self._current = {}
+
+    def on_user_stopped_speaking(self) -> None:
+        self._current["end_of_speech"] = time.monotonic()
+
+    def on_agent_started_speaking(self) -> None:
+        if "end_of_speech" not in self._current:
+            # not an answer to the user (greeting, text chat, ...)
+            return
+
+        self.mark("first_audio")
+        self._playing, self._current = self._current, {}
+
+    def on_agent_stopped_speaking(self) -> None:
+        if self._playing is None:
+            return
+
+        turn, self._playing = self._playing, None
+        turn.setdefault("turn_end", time.monotonic())
+        end_of_speech = turn["end_of_speech"]
+        durations = {
+            stage: max(0.0, turn[stage] - end_of_speech)
+            for stage in STAGES
+            if stage in turn
+        }
+        if self._histograms is not None:
+            for stage, seconds in durations.items():
+                self._histograms.observe(self._persona, stage, seconds)
+
+        logging.info(
+            "turn timeline: %s",
+            ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in durations.items()),
+        )
+
+
+class TimedLLM(llm.LLM):
+    """Stamp the request and the first token of every LLM answer."""
+
+    def __init__(self, inner: llm.LLM, timeline: TurnTimeline) -> None:
+        self._inner = inner
+        self._timeline = timeline
+
+    async def chat(
+        self,
+        history: llm.ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        turn = self._timeline.turn
+        self._timeline.mark("llm_request", turn)
+        stream = await self._inner.chat(
+            history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+        )
+        return _TimedLLMStream(stream, self._timeline, turn)
+
+
+class _TimedLLMStream(llm.LLMStream):
+    def __init__(
+        self, inner: llm.LLMStream, timeline: TurnTimeline, turn: Dict[str, float]
+    ) -> None:
+        super().__init__()
+        self._inner = inner
+        self._timeline = timeline
+        self._turn = turn
+
+    @property
+    def called_functions(self) -> list[llm.CalledFunction]:
+        return self._inner.called_functions
+
+    def __aiter__(self) -> "_TimedLLMStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        chunk = await self._inner.__anext__()
+        self._timeline.mark("llm_first_token", self._turn)
+        return chunk
+
+    async def aclose(self, wait: bool = True) -> None:
+        await self._inner.aclose(wait=wait)
+
+
+class TimedTTS(TTS):
+    """Stamp the first synthesized audio of every answer."""
+
+    def __init__(self, inner: TTS, timeline: TurnTimeline) -> None:
+        super().__init__(
+            streaming_supported=inner.streaming_supported,
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        self._inner = inner
+        self._timeline = timeline
+
+    def synthesize(self, text: str) -> ChunkedStream:
+        stream = self._inner.synthesize(text=text)
+        return _TimedChunkedStream(stream, self._timeline, self._timeline.turn)
+
+    def stream(self) -> SynthesizeStream:
+        stream = self._inner.stream()
+        return _TimedSynthesizeStream(stream, self._timeline, self._timeline.turn)
+
+
+class _TimedChunkedStream(ChunkedStream):
+    def __init__(
+        self, inner: ChunkedStream, timeline: TurnTimeline, turn: Dict[str, float]
+    ) -> None:
+        self._inner = inner
+        self._timeline = timeline
+        self._turn = turn
+
+    async def __anext__(self):
+        audio = await self._inner.__anext__()
+        self._timeline.mark("tts_first_byte", self._turn)
+        return audio
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _TimedSynthesizeStream(SynthesizeStream):
+    def __init__(
+        self, inner: SynthesizeStream, timeline: TurnTimeline, turn: Dict[str, float]
+    ) -> None:
+        self._inner = inner
+        self._timeline = timeline
+        self._turn = turn
+
+    def push_text(self, token: str | None) -> None:
+        self._inner.push_text(token)
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        await self._inner.aclose(wait=wait)
+
+    async def __anext__(self) -> SynthesisEvent:
+        event = await self._inner.__anext__()
+        if event.type == SynthesisEventType.AUDIO:
+            self._timeline.mark("tts_first_byte", self._turn)
+        return event
+
+
+histograms: LatencyHistograms | None = None
+connect_histograms: LatencyHistograms | None = None
+prewarm_histograms: LatencyHistograms | None = None
+
+
+def setup(persona_names: List[str]) -> None:
+    """Create the histograms, must run in the worker before any job is forked."""
+    global histograms, connect_histograms, prewarm_histograms
+    histograms = LatencyHistograms(persona_names)
+    connect_histograms, prewarm_histograms = (
+        LatencyHistograms(
+            persona_names,
+            stages=PROVIDERS,
+            label="provider",
+            metric=metric,
+            description=description,
+        )
+        for metric, description in (
+            (CONNECT_METRIC, CONNECT_HELP),
+            (PREWARM_METRIC, PREWARM_HELP),
+        )
+    )
+
+
+def add_persona(name: str) -> None:
+    for h in (histograms, connect_histograms, prewarm_histograms):
+        if h is not None:
+            h.add_persona(name)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/metrics" or histograms is None:
+            self.send_error(404)
+            return
+
+        body = "".join(
+            h.render()
+            for h in (histograms, connect_histograms, prewarm_histograms)
+            if h is not None
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug("metrics: " + format, *args)
+
+
+def serve() -> None:
+    """Serve /metrics on METRICS_HOST:METRICS_PORT from a background thread."""
+    host = os.environ.get("METRICS_HOST", "127.0.0.1")
+    port = int(os.environ.get("METRICS_PORT", "9464"))
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    # the job processes must not keep the port open
+    os.register_at_fork(after_in_child=server.socket.close)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info("serving metrics on http://%s:%d/metrics", host, port)
@@ -0,0 +1,57 @@
+import copy
+import logging
+import time
+
+from livekit.plugins import silero
+
+
+class ModelRegistry:
+    """Local models shared by every session of the worker.
+
+    The models are loaded once in the worker process, before the job processes
+    are forked from it, so every session reuses the same weights and inference
+    session instead of loading its own copy.
+    """
+
+    def __init__(self) -> None:
+        self._silero_model = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._silero_model is not None
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+
+        start = time.perf_counter()
+        self._silero_model = silero.VAD()._model
+        logging.info("loaded silero VAD in %.2fs", time.perf_counter() - start)
+
+    def vad(self) -> silero.VAD:
+        """A VAD for one session, sharing the loaded model.
+
+        The silero model keeps its recurrent state on the model object, every
+        session gets a shallow copy holding its own state on top of the shared
+        inference session.
+        """
+        self.load()
+        vad = silero.VAD.__new__(silero.VAD)
+        vad._model = _stream_handle(self._silero_model)
+        return vad
+
+
+def _stream_handle(model):
+    try:
+        handle = copy.copy(model)
+    except Exception:
+        logging.warning("cannot copy the silero model, sharing its state")
+        return model
+
+    if hasattr(handle, "reset_states"):
+        handle.reset_states()
+
+    return handle
+
+
+registry = ModelRegistry()
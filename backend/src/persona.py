@@ -0,0 +1,227 @@
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+import threading
+from dataclasses import dataclass
+from typing import Annotated, Callable, Dict, List
+
+import watchfiles
+from livekit import agents
+from livekit.agents.voice_assistant import AssistantContext
+
+from endpointing import EndpointingPolicy
+from vision import ImagePolicy
+
+# one <name>.json per persona, with the fields of Persona, and the text files
+# named by its "system_prompt_file" and "knowledge_file"
+PERSONA_DIR_ENV = "PERSONA_DIR"
+DEFAULT_PERSONA_DIR = pathlib.Path(__file__).resolve().parents[1] / "personas"
+# the files are reloaded once they haven't changed for this long (in ms), an
+# edit saved several times reloads once, within RELOAD_MAX_DELAY_MS
+RELOAD_QUIET_MS = 1000
+RELOAD_MAX_DELAY_MS = 10000
+
+
+@dataclass(frozen=True)
+class Persona:
+    """Everything that differs between two agents sharing the same worker."""
+
+    name: str
+    language: str
+    system_prompt: str
+    greeting: str
+    no_image_message: str
+    image_fnc_desc: str
+    user_msg_desc: str
+    voice: str = "alloy"
+    llm_model: str = "gpt-4o"
+    stt_model: str = "nova-2-general"
+    stt_language: str | None = None
+    vision: bool = True
+    # seconds between background frame samples, the camera then stays subscribed;
+    # None grabs frames only on request, subscribing the camera meanwhile
+    frame_sample_interval: float | None = None
+    image_policy: ImagePolicy = ImagePolicy()
+    # token budget of every LLM request, system prompt included
+    max_context_tokens: int = 16000
+    # summarize evicted turns instead of only dropping them
+    compact_context: bool = True
+    # start the LLM request on stable interim transcripts, see speculation.py
+    speculative_llm: bool = False
+    # bounds of the adaptive end-of-turn silence
+    endpointing: EndpointingPolicy = EndpointingPolicy()
+    # concurrent sessions of this persona on one worker, None for no limit
+    max_sessions: int | None = None
+    # answer the questions asked before from recorded answers, see answer_cache.py
+    answer_cache: bool = False
+    # reference documents searched at every turn instead of sent whole, see knowledge.py
+    knowledge: str = ""
+    # passages of the knowledge added to each request
+    knowledge_passages: int = 4
+
+
+def build_fnc_ctx(persona: Persona) -> agents.llm.FunctionContext:
+    """Function context exposing the `image` tool, described in the persona's language."""
+
+    class AssistantFnc(agents.llm.FunctionContext):
+        @agents.llm.ai_callable(desc=persona.image_fnc_desc)
+        async def image(
+            self,
+            user_msg: Annotated[
+                str,
+                agents.llm.TypeInfo(desc=persona.user_msg_desc),
+            ],
+        ):
+            ctx = AssistantContext.get_current()
+            ctx.store_metadata("user_msg", user_msg)
+
+    return AssistantFnc()
+
+
+_NESTED = {"image_policy": ImagePolicy, "endpointing": EndpointingPolicy}
+
+
+def load_persona(path: pathlib.Path) -> Persona:
+    """Read the persona defined by a JSON file, named after the file."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    prompt_file = data.pop("system_prompt_file", None)
+    if prompt_file is not None:
+        prompt = (path.parent / prompt_file).read_text(encoding="utf-8")
+        data["system_prompt"] = prompt.strip()
+    knowledge_file = data.pop("knowledge_file", None)
+    if knowledge_file is not None:
+        data["knowledge"] = (path.parent / knowledge_file).read_text(encoding="utf-8")
+
+    fields = {f.name for f in dataclasses.fields(Persona)}
+    unknown = set(data) - fields
+    if unknown:
+        raise ValueError(f"unknown persona fields {sorted(unknown)}")
+
+    for key, cls in _NESTED.items():
+        if key in data:
+            data[key] = cls(**data[key])
+
+    return Persona(name=path.stem, **data)
+
+
+def load_personas(directory: str | os.PathLike | None = None) -> Dict[str, Persona]:
+    if directory is None:
+        directory = os.environ.get(PERSONA_DIR_ENV, DEFAULT_PERSONA_DIR)
+
+    personas = {}
+    for path in sorted(pathlib.Path(directory).glob("*.json")):
+        persona = load_persona(path)
+        personas[persona.name] = persona
+
+    return personas
+
+
+class PersonaRegistry:
+    """The personas of the data files, reloaded when the files change.
+
+    Sessions get the persona current when their job was accepted: the job
+    processes are forked with their own copy, a reload only changes the
+    persona of the next sessions. A file that fails to load keeps its previous
+    version.
+    """
+
+    def __init__(self, directory: str | os.PathLike | None = None) -> None:
+        if directory is None:
+            directory = os.environ.get(PERSONA_DIR_ENV, DEFAULT_PERSONA_DIR)
+
+        self._directory = pathlib.Path(directory)
+        self._personas: Dict[str, Persona] | None = None
+        self._listeners: List[Callable[[Persona], None]] = []
+        self._stop = threading.Event()
+
+    @property
+    def directory(self) -> pathlib.Path:
+        return self._directory
+
+    @property
+    def personas(self) -> Dict[str, Persona]:
+        if self._personas is None:
+            self._personas = load_personas(self._directory)
+
+        return self._personas
+
+    def on_change(self, listener: Callable[[Persona], None]) -> None:
+        """Call listener with every new or changed persona, before sessions get it.
+
+        Listeners run in the watching thread and delay the reload, slow work
+        belongs in a thread of their own.
+        """
+        self._listeners.append(listener)
+
+    def reload(self) -> List[str]:
+        """Load the files again, return the names of the personas that changed."""
+        current = self.personas
+        personas = {}
+        for path in sorted(self._directory.glob("*.json")):
+            try:
+                personas[path.stem] = load_persona(path)
+            except Exception:
+                logging.exception("failed to load %s, keeping the loaded persona", path)
+                if path.stem in current:
+                    personas[path.stem] = current[path.stem]
+
+        changed = [n for n, p in personas.items() if current.get(n) != p]
+        for name in changed:
+            for listener in self._listeners:
+                try:
+                    listener(personas[name])
+                except Exception:
+                    logging.exception("persona listener failed for %s", name)
+
+        # swapped at once, a request reads either version
+        self._personas = personas
+        for name in changed:
+            logging.info(
+                "%s persona %s", "reloaded" if name in current else "added", name
+            )
+        for name in current.keys() - personas.keys():
+            logging.info("removed persona %s", name)
+
+        return changed
+
+    def watch(self) -> None:
+        """Reload the personas from a background thread whenever their files change."""
+        threading.Thread(target=self._watch, name="persona-watch", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        for _ in watchfiles.watch(
+            self._directory,
+            step=RELOAD_QUIET_MS,
+            debounce=RELOAD_MAX_DELAY_MS,
+            stop_event=self._stop,
+        ):
+            self.reload()
+
+
+registry = PersonaRegistry()
+
+
+def persona_from_metadata(*metadata: str) -> str | None:
+    """Return the first persona name found in the given JSON metadata strings.
+
+    Metadata that is empty, not JSON or without a "persona" key is ignored.
+    """
+    for raw in metadata:
+        if not raw:
+            continue
+
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            logging.warning("ignoring non JSON metadata %r", raw)
+            continue
+
+        if isinstance(data, dict) and data.get("persona"):
+            return str(data["persona"])
+
+    return None
@@ -0,0 +1,70 @@
+"""Synthesize the static phrases of every persona into the audio cache.
+
+Run it at deploy time, the worker renders the phrases of the personas it
+reloads itself:
+
+    python src/prerender_audio.py [--force]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Iterable, List
+
+import aiohttp
+from dotenv import load_dotenv
+from livekit.plugins import openai
+
+from audio_cache import AudioCache
+from persona import Persona, load_personas
+
+load_dotenv()
+
+
+def static_phrases(persona: Persona) -> List[str]:
+    phrases = [persona.greeting]
+    if persona.vision:
+        phrases.append(persona.no_image_message)
+
+    return phrases
+
+
+async def prerender(
+    cache: AudioCache, force: bool, personas: Iterable[Persona] | None = None
+) -> None:
+    if personas is None:
+        personas = load_personas().values()
+
+    async with aiohttp.ClientSession() as session:
+        for persona in personas:
+            engine = openai.TTS(voice=persona.voice, http_session=session)
+            for text in static_phrases(persona):
+                cached = cache.get(text, persona.voice, engine.sample_rate)
+                if cached is not None and not force:
+                    continue
+
+                frame = await engine.synthesize(text).collect()
+                pcm = frame.data.cast("B").tobytes()
+                cache.put(text, persona.voice, engine.sample_rate, pcm)
+                logging.info(
+                    "%s: rendered %.2fs of audio for %r",
+                    persona.name,
+                    frame.samples_per_channel / frame.sample_rate,
+                    text[:40],
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true", help="render cached phrases again")
+    parser.add_argument("--cache-dir", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cache = AudioCache(args.cache_dir)
+    asyncio.run(prerender(cache, args.force))
+    logging.info("audio cache ready in %s", cache.directory)
+
+
+if __name__ == "__main__":
+    main()
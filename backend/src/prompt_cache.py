@@ -0,0 +1,265 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import types
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import httpx
+import openai
+from livekit.agents import llm
+from livekit.plugins.openai.llm import to_openai_tools
+
+from context_window import count_text_tokens
+from persona import Persona, build_fnc_ctx
+
+# OpenAI only caches prompts from 1024 tokens, then by blocks of 128
+MIN_CACHED_TOKENS = 1024
+
+PREFIX_STATE_ENV = "PROMPT_PREFIX_STATE"
+DEFAULT_PREFIX_STATE = (
+    pathlib.Path(__file__).resolve().parents[1] / ".prompt_prefixes.json"
+)
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """What every request of a session starts with: the system prompt, then the tools."""
+
+    system_prompt: str
+    tools: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls, system_prompt: str, fnc_ctx: llm.FunctionContext | None
+    ) -> "PromptPrefix":
+        return cls(system_prompt, to_openai_tools(fnc_ctx) if fnc_ctx else [])
+
+    @property
+    def tools_json(self) -> str:
+        return json.dumps(self.tools, ensure_ascii=False, sort_keys=True)
+
+    def tokens(self, model: str = "gpt-4o") -> int:
+        return count_text_tokens(self.system_prompt, model) + count_text_tokens(
+            self.tools_json, model
+        )
+
+    def fingerprint(self) -> str:
+        data = json.dumps([self.system_prompt, self.tools_json], ensure_ascii=False)
+        return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+@dataclass
+class CacheStats:
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    # requests that found nothing cached right after a request that did
+    misses: int = 0
+
+    def as_dict(self) -> dict:
+        ratio = self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(ratio, 3),
+            "misses": self.misses,
+        }
+
+
+def _cached_tokens(usage) -> int:
+    # not modelled by every openai version, kept as an extra field then
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+
+    return getattr(details, "cached_tokens", None) or 0
+
+
+class PromptCacheClient:
+    """OpenAI client keeping the prefix of a session's requests byte-stable.
+
+    Passed to openai.LLM. Requests starting with the session's system prompt
+    always carry its tool schemas, disabled with tool_choice when the caller
+    has no functions (answers to chat messages and images), so they share the
+    same cached prefix. Every stream reports its usage, the cached tokens are
+    counted in stats.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        prefix: PromptPrefix,
+        *,
+        model: str = "gpt-4o",
+        client: openai.AsyncClient | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self._label = label
+        self._prefix = prefix
+        self._prefix_tokens = prefix.tokens(model)
+        self._client = client
+        self._http_client = http_client
+        self._warm = False
+        self._warned_tools = False
+        self.stats = CacheStats()
+        # the plugin calls client.chat.completions.create()
+        self.chat = types.SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        if self._client is None:
+            self._client = openai.AsyncClient(http_client=self._http_client)
+
+        session_request = self._starts_with_prefix(kwargs.get("messages") or [])
+        if session_request:
+            self._lay_out_tools(kwargs)
+        if kwargs.get("stream"):
+            kwargs.setdefault("stream_options", {"include_usage": True})
+
+        stream = await self._client.chat.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            self._on_usage(stream.usage, session_request)
+            return stream
+
+        return _UsageStream(
+            stream, lambda usage: self._on_usage(usage, session_request)
+        )
+
+    def _starts_with_prefix(self, messages: List[dict]) -> bool:
+        if not messages or messages[0].get("role") != "system":
+            return False
+
+        content = messages[0].get("content")
+        if isinstance(content, list):
+            content = "".join(c.get("text", "") for c in content)
+
+        return content == self._prefix.system_prompt
+
+    def _lay_out_tools(self, kwargs: dict) -> None:
+        tools = kwargs.get("tools")
+        if not tools:
+            if self._prefix.tools:
+                kwargs["tools"] = self._prefix.tools
+                kwargs["tool_choice"] = "none"
+        elif tools != self._prefix.tools and not self._warned_tools:
+            self._warned_tools = True
+            logging.warning(
+                "%s request with other tools than its prefix, not cached past the system prompt",
+                self._label,
+            )
+
+    def _on_usage(self, usage, session_request: bool) -> None:
+        if usage is None:
+            return
+
+        cached = _cached_tokens(usage)
+        self.stats.requests += 1
+        self.stats.prompt_tokens += usage.prompt_tokens
+        self.stats.cached_tokens += cached
+        if not session_request or usage.prompt_tokens < MIN_CACHED_TOKENS:
+            return
+
+        logging.debug(
+            "%s request: %d of %d prompt tokens cached",
+            self._label,
+            cached,
+            usage.prompt_tokens,
+        )
+        if self._warm and cached == 0 and self._prefix_tokens >= MIN_CACHED_TOKENS:
+            self.stats.misses += 1
+            logging.warning(
+                "%s request: none of its %d prompt tokens cached, the previous one was",
+                self._label,
+                usage.prompt_tokens,
+            )
+        self._warm = cached > 0
+
+
+class _UsageStream:
+    """Pass the chunks of an OpenAI stream through, handing its usage to a callback."""
+
+    def __init__(self, stream, on_usage) -> None:
+        self._stream = stream
+        self._on_usage = on_usage
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def __aiter__(self) -> "_UsageStream":
+        return self
+
+    async def __anext__(self):
+        chunk = await self._stream.__anext__()
+        if getattr(chunk, "usage", None) is not None:
+            try:
+                self._on_usage(chunk.usage)
+            except Exception:
+                logging.exception("failed to record the prompt usage")
+
+        return chunk
+
+
+def _first_difference(old: str, new: str) -> int:
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a != b:
+            return i
+
+    return min(len(old), len(new))
+
+
+def check_prefixes(personas: Dict[str, Persona]) -> None:
+    """Warn about the personas whose prefix changed since it was last checked.
+
+    Their prompts are cached again from the first request, and only up to the
+    first change. The prefixes are then saved for the next check, at the next
+    start or reload.
+    """
+    path = pathlib.Path(os.environ.get(PREFIX_STATE_ENV, DEFAULT_PREFIX_STATE))
+    try:
+        previous = json.loads(path.read_text())
+    except (OSError, ValueError):
+        previous = {}
+
+    state = dict(previous)
+    for name, persona in personas.items():
+        fnc_ctx = build_fnc_ctx(persona) if persona.vision else None
+        prefix = PromptPrefix.build(persona.system_prompt, fnc_ctx)
+        model = persona.llm_model
+        tokens = prefix.tokens(model)
+        state[name] = {
+            "fingerprint": prefix.fingerprint(),
+            "system_prompt": prefix.system_prompt,
+            "tools": prefix.tools_json,
+        }
+        if tokens < MIN_CACHED_TOKENS:
+            logging.info(
+                "persona %s: %d tokens prefix, too short to be cached", name, tokens
+            )
+
+        old = previous.get(name)
+        if old is None or old.get("fingerprint") == state[name]["fingerprint"]:
+            continue
+
+        if old.get("system_prompt") != prefix.system_prompt:
+            at = _first_difference(old.get("system_prompt", ""), prefix.system_prompt)
+            kept = count_text_tokens(prefix.system_prompt[:at], model)
+            line = prefix.system_prompt.count("\n", 0, at) + 1
+            where = f"system prompt changed at line {line}"
+        else:
+            kept = count_text_tokens(prefix.system_prompt, model)
+            where = "tool schemas changed"
+        logging.warning(
+            "persona %s: %s, only %d of its %d prefix tokens stay cached",
+            name,
+            where,
+            kept,
+            tokens,
+        )
+
+    try:
+        path.write_text(json.dumps(state, ensure_ascii=False, indent=1))
+    except OSError:
+        logging.warning("can't save the prompt prefixes to %s", path)
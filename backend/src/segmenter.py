@@ -0,0 +1,196 @@
+import asyncio
+import re
+from typing import List, Optional
+
+from livekit.agents.tokenize import tokenizer
+
+# a period after these words doesn't end the sentence
+ABBREVIATIONS = {
+    "en": {
+        "mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "etc", "inc",
+        "ltd", "co", "no", "approx", "dept", "e.g", "i.e", "a.m", "p.m", "u.s",
+    },
+    "fr": {
+        "m", "mm", "mme", "mmes", "mlle", "dr", "pr", "st", "ste", "etc", "cf",
+        "p", "pp", "env", "av", "bd", "n°", "tél", "ex", "p.ex", "c.-à-d",
+    },
+    "es": {
+        "sr", "sra", "srta", "sres", "dr", "dra", "ud", "uds", "etc", "pág",
+        "núm", "av", "avda", "c", "aprox", "tel", "p.ej", "ee.uu",
+    },
+}
+# abbreviations that may also end a sentence, when the next one starts with a capital
+SENTENCE_FINAL_ABBREVIATIONS = {"etc"}
+
+SENTENCE_END = ".!?…"
+# punctuation followed by closing quotes/brackets, then whitespace and more text
+BOUNDARY_RE = re.compile(r"(\.{3}|…|[.!?]+|[,;:—–])[»\"”’')\]]*(?=\s+(\S))")
+
+
+class ClauseSegmenter:
+    """Split streamed text at sentence and clause boundaries.
+
+    The first chunk is cut at the first clause boundary (comma, colon, ...) once
+    it is first_min_len characters long, so TTS can start early. The minimum
+    length then grows by growth for every chunk, later chunks are longer and
+    sound more natural. Sentence ends are always boundaries once first_min_len
+    is reached.
+    """
+
+    def __init__(
+        self,
+        *,
+        language: str = "en",
+        first_min_len: int = 20,
+        growth: float = 2.0,
+        max_min_len: int = 150,
+        max_len: int = 300,
+    ) -> None:
+        self._abbreviations = ABBREVIATIONS.get(
+            language[:2].lower(), ABBREVIATIONS["en"]
+        )
+        self._first_min_len = first_min_len
+        self._growth = growth
+        self._max_min_len = max_min_len
+        self._max_len = max_len
+        self._buffer = ""
+        self._min_len = first_min_len
+
+    def push(self, text: str) -> List[str]:
+        self._buffer += text
+        chunks = []
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return chunks
+
+            chunks.append(chunk)
+
+    def flush(self) -> List[str]:
+        """End of the segment, return what is left and start over."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        self._min_len = self._first_min_len
+        return [rest] if rest else []
+
+    def _next_chunk(self) -> Optional[str]:
+        self._buffer = self._buffer.lstrip()
+        for m in BOUNDARY_RE.finditer(self._buffer):
+            end = m.end()
+            if m.group(1)[0] in SENTENCE_END:
+                if end < self._first_min_len or self._is_abbreviation(m):
+                    continue
+            elif end < self._min_len:
+                continue
+
+            return self._cut(end)
+
+        if len(self._buffer) > self._max_len:
+            return self._cut(self._last_space(self._max_len))
+
+        return None
+
+    def _cut(self, end: int) -> str:
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:]
+        self._min_len = min(int(self._min_len * self._growth), self._max_min_len)
+        return chunk
+
+    def _is_abbreviation(self, m: re.Match) -> bool:
+        if m.group(1) != ".":
+            return False
+
+        before = self._buffer[: m.start()]
+        words = before.split()
+        if not words:
+            return False
+
+        word = words[-1].lstrip("(«\"“'¿¡").lower()
+        if word in self._abbreviations:
+            return not (
+                word in SENTENCE_FINAL_ABBREVIATIONS and m.group(2).isupper()
+            )
+
+        # initials (J. Dupont) and acronyms (U.S.A.)
+        if len(word) == 1 and word.isalpha() or "." in word:
+            return True
+
+        # numbered lists, "1. Appelez-nous", "ateliers : 1. Innovation 2. Leadership"
+        return word.isdigit() and len(word) <= 2
+
+    def _last_space(self, limit: int) -> int:
+        # don't separate the groups of a number, "1 000 euros"
+        for i in range(limit, 0, -1):
+            c = self._buffer[i]
+            if c.isspace() and not (
+                self._buffer[i - 1].isdigit() and self._buffer[i + 1 : i + 2].isdigit()
+            ):
+                return i
+
+        return limit
+
+
+class ClauseStream(tokenizer.SentenceStream):
+    def __init__(self, segmenter: ClauseSegmenter) -> None:
+        self._segmenter = segmenter
+        self._event_queue = asyncio.Queue[Optional[tokenizer.TokenEvent]]()
+        self._closed = False
+        self._new_segment = True
+
+    def push_text(self, text: str | None) -> None:
+        if self._closed:
+            raise ValueError("cannot push text to closed stream")
+
+        if self._new_segment:
+            self._new_segment = False
+            self._put(tokenizer.TokenEventType.STARTED)
+
+        if text is None:
+            self._put_tokens(self._segmenter.flush())
+            self._put(tokenizer.TokenEventType.FINISHED)
+            self._new_segment = True
+            return
+
+        self._put_tokens(self._segmenter.push(text))
+
+    def mark_segment_end(self) -> None:
+        self.push_text(None)
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        self._closed = True
+        self._put_tokens(self._segmenter.flush())
+        self._event_queue.put_nowait(None)
+
+    def _put(self, type: tokenizer.TokenEventType, token: str = "") -> None:
+        self._event_queue.put_nowait(tokenizer.TokenEvent(type=type, token=token))
+
+    def _put_tokens(self, tokens: List[str]) -> None:
+        for token in tokens:
+            self._put(tokenizer.TokenEventType.TOKEN, token)
+
+    def __aiter__(self) -> "ClauseStream":
+        return self
+
+    async def __anext__(self) -> tokenizer.TokenEvent:
+        event = await self._event_queue.get()
+        if event is None:
+            raise StopAsyncIteration
+
+        return event
+
+
+class ClauseTokenizer(tokenizer.SentenceTokenizer):
+    """Sentence tokenizer for the TTS stream adapter, flushing at clause boundaries."""
+
+    def __init__(self, *, language: str = "en", **options) -> None:
+        self._language = language
+        self._options = options
+
+    def tokenize(self, *, text: str, language: str | None = None) -> List[str]:
+        segmenter = self._segmenter(language)
+        return segmenter.push(text) + segmenter.flush()
+
+    def stream(self, *, language: str | None = None) -> ClauseStream:
+        return ClauseStream(self._segmenter(language))
+
+    def _segmenter(self, language: str | None) -> ClauseSegmenter:
+        return ClauseSegmenter(language=language or self._language, **self._options)
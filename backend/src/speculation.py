@@ -0,0 +1,311 @@
+import asyncio
+import functools
+import logging
+import re
+import time
+from typing import Callable, List, Tuple
+
+import attrs
+from livekit.agents import llm, stt
+from livekit.agents.llm import ChatContext, ChatMessage, ChatRole
+
+from context_window import ContextWindow, count_text_tokens
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def word_distance(a: str, b: str) -> float:
+    """Word level edit distance, relative to the longest text."""
+    wa, wb = _words(a), _words(b)
+    if not wa and not wb:
+        return 0.0
+
+    previous = list(range(len(wb) + 1))
+    for i, word in enumerate(wa, 1):
+        current = [i]
+        for j, other in enumerate(wb, 1):
+            substitution = previous[j - 1] + (word != other)
+            current.append(min(previous[j] + 1, current[j - 1] + 1, substitution))
+        previous = current
+
+    return previous[-1] / max(len(wa), len(wb))
+
+
+class ObservedSTT(stt.STT):
+    """Pass the events of the inner streaming STT to a callback."""
+
+    def __init__(
+        self, inner: stt.STT, on_event: Callable[[stt.SpeechEvent], None]
+    ) -> None:
+        super().__init__(streaming_supported=inner.streaming_supported)
+        self._inner = inner
+        self._on_event = on_event
+
+    async def recognize(self, *, buffer, language: str | None = None):
+        return await self._inner.recognize(buffer=buffer, language=language)
+
+    def stream(self, *, language: str | None = None) -> stt.SpeechStream:
+        return _ObservedStream(self._inner.stream(language=language), self._on_event)
+
+
+class _ObservedStream(stt.SpeechStream):
+    def __init__(self, inner: stt.SpeechStream, on_event) -> None:
+        self._inner = inner
+        self._on_event = on_event
+
+    def push_frame(self, frame) -> None:
+        self._inner.push_frame(frame)
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        await self._inner.aclose(wait=wait)
+
+    async def __anext__(self) -> stt.SpeechEvent:
+        event = await self._inner.__anext__()
+        try:
+            self._on_event(event)
+        except Exception:
+            logging.exception("speech event callback failed")
+
+        return event
+
+
+class _DeferredFunctions(llm.FunctionContext):
+    """The functions of fnc_ctx, recorded instead of called.
+
+    A speculative answer must not run functions before it is kept, and they
+    must run inside the voice assistant's context (AssistantContext).
+    """
+
+    def __init__(self, fnc_ctx: llm.FunctionContext) -> None:
+        super().__init__()
+        self.calls: List[Tuple[str, dict]] = []
+        self._fncs = {
+            name: attrs.evolve(fnc, fnc=functools.partial(self._record, name))
+            for name, fnc in fnc_ctx.ai_functions.items()
+        }
+
+    async def _record(self, name: str, **args) -> None:
+        self.calls.append((name, args))
+
+
+class _Speculation:
+    def __init__(
+        self, text: str, chat_ctx: ChatContext, fnc_ctx: llm.FunctionContext | None
+    ) -> None:
+        self.text = text
+        self.base = list(chat_ctx.messages)
+        self.chat_ctx = chat_ctx.copy()
+        self.chat_ctx.messages.append(ChatMessage(role=ChatRole.USER, text=text))
+        self.deferred = _DeferredFunctions(fnc_ctx) if fnc_ctx else None
+        self.started_at = time.monotonic()
+        self.chunks = asyncio.Queue()
+        self.content: List[str] = []
+        self.task: asyncio.Task | None = None
+
+
+class _SpeculativeStream(llm.LLMStream):
+    def __init__(self, spec: _Speculation, fnc_ctx: llm.FunctionContext | None) -> None:
+        super().__init__()
+        self._spec = spec
+        self._fnc_ctx = fnc_ctx
+        self._running_fncs: set[asyncio.Task] = set()
+        self._done = False
+        self.started = False
+
+    def __aiter__(self) -> "_SpeculativeStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        self.started = True
+        if self._done:
+            raise StopAsyncIteration
+
+        item = await self._spec.chunks.get()
+        if isinstance(item, Exception):
+            self._done = True
+            raise item
+
+        if item is None:
+            self._done = True
+            self._call_functions()
+            raise StopAsyncIteration
+
+        return item
+
+    def _call_functions(self) -> None:
+        if self._spec.deferred is None:
+            return
+
+        for name, args in self._spec.deferred.calls:
+            fnc = self._fnc_ctx.ai_functions[name].fnc
+            self._called_functions.append(
+                llm.CalledFunction(fnc_name=name, fnc=fnc, args=args)
+            )
+            if asyncio.iscoroutinefunction(fnc):
+                task = asyncio.create_task(fnc(**args))
+            else:
+                task = asyncio.create_task(asyncio.to_thread(fnc, **args))
+            self._running_fncs.add(task)
+            task.add_done_callback(self._running_fncs.discard)
+
+    async def aclose(self, wait: bool = True) -> None:
+        if self._spec.task is not None and not self._spec.task.done():
+            self._spec.task.cancel()
+
+        if not wait:
+            for task in self._running_fncs:
+                task.cancel()
+
+        await asyncio.gather(*self._running_fncs, return_exceptions=True)
+
+
+class SpeculativeLLM(llm.LLM):
+    """Start answering on a stable interim transcript.
+
+    Feed the STT events to on_speech_event(). Once the interim transcript is
+    the same for stable_interims events, the request is sent. When the voice
+    assistant asks for the answer to the final transcript, the speculative one
+    is kept if the text is within max_distance (word edit distance) and the
+    history didn't change, otherwise it is cancelled.
+    """
+
+    def __init__(
+        self,
+        inner: llm.LLM,
+        *,
+        chat_ctx: ChatContext,
+        fnc_ctx: llm.FunctionContext | None,
+        window: ContextWindow,
+        max_distance: float = 0.2,
+        stable_interims: int = 2,
+        min_words: int = 3,
+    ) -> None:
+        self._inner = inner
+        self._chat_ctx = chat_ctx
+        self._fnc_ctx = fnc_ctx
+        self._window = window
+        self._max_distance = max_distance
+        self._stable_interims = stable_interims
+        self._min_words = min_words
+
+        self._finals = ""
+        self._candidate = ""
+        self._stable = 0
+        self._speculation: _Speculation | None = None
+        self._adopted: _SpeculativeStream | None = None
+
+        self.started = 0
+        self.adopted = 0
+        self.cancelled = 0
+        self.saved = 0.0
+        self.wasted_tokens = 0
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "adopted": self.adopted,
+            "cancelled": self.cancelled,
+            "saved_s": round(self.saved, 2),
+            "wasted_tokens": self.wasted_tokens,
+        }
+
+    def on_speech_event(self, event: stt.SpeechEvent) -> None:
+        if not event.alternatives:
+            return
+
+        text = event.alternatives[0].text
+        if event.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+            # same concatenation as the voice assistant
+            self._finals += text
+            self._candidate, self._stable = "", 0
+        elif event.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
+            candidate = (self._finals + text).strip()
+            self._stable = self._stable + 1 if candidate == self._candidate else 1
+            self._candidate = candidate
+            if self._stable >= self._stable_interims:
+                self._speculate(candidate)
+
+    def reset(self) -> None:
+        """The user turn is over (the voice assistant validated it)."""
+        self._finals, self._candidate, self._stable = "", "", 0
+
+    async def chat(
+        self,
+        history: ChatContext,
+        fnc_ctx: llm.FunctionContext | None = None,
+        temperature: float | None = None,
+        n: int | None = 1,
+    ) -> llm.LLMStream:
+        if self._adopted is not None and not self._adopted.started:
+            # a later final transcript replaced the answer we gave before
+            await self._adopted.aclose(wait=False)
+        self._adopted = None
+
+        spec, self._speculation = self._speculation, None
+        if spec is not None and self._matches(spec, history):
+            self.adopted += 1
+            self.saved += time.monotonic() - spec.started_at
+            logging.info(
+                "kept the speculative answer to %r, %.2fs ahead",
+                spec.text,
+                time.monotonic() - spec.started_at,
+            )
+            self._adopted = _SpeculativeStream(spec, self._fnc_ctx)
+            return self._adopted
+
+        if spec is not None:
+            self._cancel(spec)
+
+        return await self._inner.chat(
+            history, fnc_ctx=fnc_ctx, temperature=temperature, n=n
+        )
+
+    def _speculate(self, text: str) -> None:
+        if len(_words(text)) < self._min_words:
+            return
+
+        if self._speculation is not None:
+            if word_distance(text, self._speculation.text) <= self._max_distance:
+                return
+
+            self._cancel(self._speculation)
+
+        spec = _Speculation(text, self._chat_ctx, self._fnc_ctx)
+        spec.task = asyncio.create_task(self._run(spec))
+        self._speculation = spec
+        self.started += 1
+
+    def _matches(self, spec: _Speculation, history: ChatContext) -> bool:
+        messages = history.messages
+        if len(messages) != len(spec.base) + 1:
+            return False
+
+        if any(a is not b for a, b in zip(messages, spec.base)):
+            return False
+
+        return word_distance(messages[-1].text, spec.text) <= self._max_distance
+
+    def _cancel(self, spec: _Speculation) -> None:
+        spec.task.cancel()
+        self.cancelled += 1
+        self.wasted_tokens += self._window.total(spec.chat_ctx) + count_text_tokens(
+            "".join(spec.content)
+        )
+
+    async def _run(self, spec: _Speculation) -> None:
+        try:
+            stream = await self._inner.chat(spec.chat_ctx, fnc_ctx=spec.deferred)
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        spec.content.append(chunk.choices[0].delta.content)
+                    spec.chunks.put_nowait(chunk)
+            finally:
+                await stream.aclose()
+        except Exception as e:
+            logging.exception("speculative request failed")
+            spec.chunks.put_nowait(e)
+        finally:
+            spec.chunks.put_nowait(None)
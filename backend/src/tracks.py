@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List
+
+from livekit import rtc
+
+# the camera stays subscribed this long after the last grab, for follow-ups
+VIDEO_HOLD_SECONDS = 15.0
+
+_EVENTS = (
+    "track_published",
+    "track_unpublished",
+    "track_subscribed",
+    "track_unsubscribed",
+    "track_muted",
+    "track_unmuted",
+    "participant_disconnected",
+)
+
+
+class VideoTrackManager:
+    """Follow the video publications of the room and hand the one to use to on_track.
+
+    Every publication, mute and subscription event picks the track again: the
+    newest unmuted camera, then other unmuted video (screen share), and None
+    while there is nothing to look at, so the grabber never waits on a muted,
+    unpublished or missing track.
+
+    With on_demand, the session joined without video (AutoSubscribe.AUDIO_ONLY)
+    and only the picked publication is subscribed, from acquire() until hold
+    seconds after the last release(): between questions the video is neither
+    received nor decoded.
+    """
+
+    def __init__(
+        self,
+        room: rtc.Room,
+        *,
+        on_demand: bool = False,
+        hold: float = VIDEO_HOLD_SECONDS,
+    ) -> None:
+        self._room = room
+        self._on_demand = on_demand
+        self._hold = hold
+        self._on_track: Callable[[rtc.RemoteVideoTrack | None], None] | None = None
+        # order of publication, the newest camera is preferred
+        self._published: Dict[str, int] = {}
+        self._publication: rtc.RemoteTrackPublication | None = None
+        self._track: rtc.RemoteVideoTrack | None = None
+        self._holders = 0
+        self._unsubscribe_handle: asyncio.TimerHandle | None = None
+        self._subscribed_at: float | None = None
+        self._subscribed_s = 0.0
+        self._subscriptions = 0
+        self._switches = 0
+
+    def start(self, on_track: Callable[[rtc.RemoteVideoTrack | None], None]) -> None:
+        self._on_track = on_track
+        for event in _EVENTS:
+            self._room.on(event, self._on_event)
+        self._update()
+
+    def close(self) -> None:
+        for event in _EVENTS:
+            self._room.off(event, self._on_event)
+        if self._unsubscribe_handle is not None:
+            self._unsubscribe_handle.cancel()
+            self._unsubscribe_handle = None
+        self._set_track(None)
+
+    def acquire(self) -> bool:
+        """Frames are wanted, return whether a track can deliver them."""
+        self._holders += 1
+        if self._unsubscribe_handle is not None:
+            self._unsubscribe_handle.cancel()
+            self._unsubscribe_handle = None
+
+        if self._on_demand and self._subscribed_at is None:
+            self._subscribed_at = time.monotonic()
+            self._subscriptions += 1
+            if self._publication is not None:
+                self._publication.set_subscribed(True)
+
+        publication = self._publication
+        return publication is not None and not publication.muted
+
+    def release(self) -> None:
+        self._holders -= 1
+        if self._holders == 0 and self._on_demand:
+            self._unsubscribe_handle = asyncio.get_running_loop().call_later(
+                self._hold, self._unsubscribe
+            )
+
+    def stats(self) -> dict:
+        stats = {"video_switches": self._switches}
+        if self._on_demand:
+            subscribed_s = self._subscribed_s
+            if self._subscribed_at is not None:
+                subscribed_s += time.monotonic() - self._subscribed_at
+            stats["subscriptions"] = self._subscriptions
+            stats["subscribed_s"] = round(subscribed_s, 1)
+
+        return stats
+
+    def _on_event(self, *_) -> None:
+        # the arguments differ per event, the room has the current state
+        self._update()
+
+    def _publications(self) -> List[rtc.RemoteTrackPublication]:
+        publications = []
+        for participant in self._room.participants.values():
+            for publication in participant.tracks.values():
+                if publication.kind == rtc.TrackKind.KIND_VIDEO:
+                    if publication.sid not in self._published:
+                        self._published[publication.sid] = len(self._published)
+                    publications.append(publication)
+
+        return publications
+
+    def _pick(
+        self, publications: List[rtc.RemoteTrackPublication]
+    ) -> rtc.RemoteTrackPublication | None:
+        if not publications:
+            return None
+
+        return max(
+            publications,
+            key=lambda p: (
+                not p.muted,
+                p.source == rtc.TrackSource.SOURCE_CAMERA,
+                self._published[p.sid],
+            ),
+        )
+
+    def _update(self) -> None:
+        publications = self._publications()
+        publication = self._pick(publications)
+        previous = self._publication
+        if publication is not previous:
+            self._publication = publication
+            if publication is not None:
+                self._switches += 1
+                logging.info("using video publication %s", publication.sid)
+            if self._on_demand and self._subscribed_at is not None:
+                if previous in publications and previous.subscribed:
+                    previous.set_subscribed(False)
+                if publication is not None:
+                    publication.set_subscribed(True)
+
+        track = None
+        if publication is not None and publication.subscribed and not publication.muted:
+            track = publication.track
+        self._set_track(track)
+
+    def _set_track(self, track: rtc.RemoteVideoTrack | None) -> None:
+        if track is self._track:
+            return
+
+        self._track = track
+        if self._on_track is not None:
+            self._on_track(track)
+
+    def _unsubscribe(self) -> None:
+        self._unsubscribe_handle = None
+        if self._holders or self._subscribed_at is None:
+            return
+
+        self._subscribed_s += time.monotonic() - self._subscribed_at
+        self._subscribed_at = None
+        if self._publication is not None and self._publication.subscribed:
+            self._publication.set_subscribed(False)
@@ -0,0 +1,250 @@
+import asyncio
+import contextlib
+import fcntl
+import logging
+import os
+import pathlib
+import tempfile
+from collections import OrderedDict
+from typing import Dict
+
+from livekit.agents import tts
+
+from audio_cache import CachedChunkedStream, phrase_key
+
+# replies longer than this are very unlikely to be repeated word for word
+MAX_CACHED_TEXT = 300
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # ~23 minutes of 24kHz mono audio
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+# phrases share this many lock files, picked by the first hex digits of their key
+LOCK_STRIPES = 256
+
+# directory shared by every job process of the worker
+TTS_CACHE_DIR_ENV = "TTS_CACHE_DIR"
+DEFAULT_TTS_CACHE_DIR = pathlib.Path(__file__).resolve().parents[1] / ".tts_cache"
+
+
+class TTSCache:
+    """LRU cache of synthesized PCM, bounded by its size in bytes.
+
+    Job processes don't share memory, with a spill directory the entries are also
+    written to disk, which makes them available to every session of the worker,
+    and a lock file makes sure a single process synthesizes a phrase. The disk
+    has its own budget, max_disk_bytes: the files used the longest ago are
+    deleted after each spill.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        spill_dir: str | os.PathLike | None = None,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ) -> None:
+        self._max_bytes = max_bytes
+        self._max_disk_bytes = max_disk_bytes
+        self._spill_dir = pathlib.Path(spill_dir) if spill_dir else None
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, asyncio.Future[bytes | None]] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+    async def get(self, key: str) -> bytes | None:
+        pcm = self._entries.get(key)
+        if pcm is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pcm
+
+        if self._spill_dir is not None:
+            try:
+                pcm = await asyncio.to_thread(self._read_spilled, key)
+            except FileNotFoundError:
+                return None
+
+            self._insert(key, pcm)
+            self.disk_hits += 1
+
+        return pcm
+
+    async def put(self, key: str, pcm: bytes) -> None:
+        self._insert(key, pcm)
+        if self._spill_dir is None:
+            return
+
+        try:
+            await asyncio.to_thread(self._spill, key, pcm)
+        except OSError:
+            logging.exception("failed to spill tts audio to %s", self._spill_dir)
+
+    @contextlib.asynccontextmanager
+    async def synthesis_lock(self, key: str):
+        """Held while a phrase is synthesized, across the job processes."""
+        if self._spill_dir is None:
+            yield
+            return
+
+        locks = self._spill_dir / "locks"
+        locks.mkdir(parents=True, exist_ok=True)
+        stripe = int(key[:8], 16) % LOCK_STRIPES
+        with open(locks / f"{stripe:03d}.lock", "w") as lock:
+            # poll instead of blocking a thread, so waiting stays cancellable
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(0.05)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_spilled(self, key: str) -> bytes:
+        path = self._spill_dir / f"{key}.pcm"
+        pcm = path.read_bytes()
+        # the modification time orders the evictions, atime is often not kept
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return pcm
+
+    def _spill(self, key: str, pcm: bytes) -> None:
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self._spill_dir, delete=False) as f:
+            f.write(pcm)
+        os.replace(f.name, self._spill_dir / f"{key}.pcm")
+        self._evict_spilled()
+
+    def _evict_spilled(self) -> None:
+        files = []
+        for path in self._spill_dir.glob("*.pcm"):
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(f[1] for f in files)
+        for _, file_size, path in sorted(files):
+            if size <= self._max_disk_bytes:
+                break
+
+            # another process may have evicted it already
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+            size -= file_size
+
+    def _insert(self, key: str, pcm: bytes) -> None:
+        if len(pcm) > self._max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+
+        self._entries[key] = pcm
+        self._size += len(pcm)
+        while self._size > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+class _GeneratorChunkedStream(tts.ChunkedStream):
+    def __init__(self, agen) -> None:
+        self._agen = agen
+
+    async def __anext__(self) -> tts.SynthesizedAudio:
+        return await self._agen.__anext__()
+
+    async def aclose(self) -> None:
+        await self._agen.aclose()
+
+
+class CachingTTS(tts.TTS):
+    """Cache the audio of short phrases, concurrent requests for a phrase share one
+    upstream synthesis."""
+
+    def __init__(self, inner: tts.TTS, *, voice: str, cache: TTSCache) -> None:
+        super().__init__(
+            streaming_supported=inner.streaming_supported,
+            sample_rate=inner.sample_rate,
+            num_channels=inner.num_channels,
+        )
+        self._inner = inner
+        self._voice = voice
+        self._cache = cache
+
+    def synthesize(self, text: str) -> tts.ChunkedStream:
+        if self.num_channels != 1 or len(text) > MAX_CACHED_TEXT:
+            return self._inner.synthesize(text)
+
+        return _GeneratorChunkedStream(self._synthesize(text))
+
+    def stream(self) -> tts.SynthesizeStream:
+        return self._inner.stream()
+
+    async def _synthesize(self, text: str):
+        key = phrase_key(text, self._voice, self.sample_rate)
+        pcm = await self._lookup(key)
+        if pcm is None:
+            self._cache.misses += 1
+            async for audio in self._synthesize_upstream(key, text):
+                yield audio
+            return
+
+        async for audio in CachedChunkedStream(text, memoryview(pcm), self.sample_rate):
+            yield audio
+
+    async def _lookup(self, key: str) -> bytes | None:
+        pcm = await self._cache.get(key)
+        if pcm is None and key in self._cache._inflight:
+            self._cache.coalesced += 1
+            pcm = await asyncio.shield(self._cache._inflight[key])
+
+        return pcm
+
+    async def _synthesize_upstream(self, key: str, text: str):
+        # followers get None when the synthesis doesn't complete and synthesize it
+        # themselves
+        done = asyncio.get_running_loop().create_future()
+        self._cache._inflight[key] = done
+        pcm = None
+        try:
+            async with self._cache.synthesis_lock(key):
+                # another process may have synthesized it while we were waiting
+                pcm = await self._cache.get(key)
+                if pcm is not None:
+                    async for audio in CachedChunkedStream(
+                        text, memoryview(pcm), self.sample_rate
+                    ):
+                        yield audio
+                    return
+
+                chunks = []
+                async for audio in self._inner.synthesize(text):
+                    chunks.append(audio.data.data.cast("B").tobytes())
+                    yield audio
+
+                pcm = b"".join(chunks)
+                await self._cache.put(key, pcm)
+        finally:
+            self._cache._inflight.pop(key, None)
+            done.set_result(pcm)
+
+
+cache = TTSCache(spill_dir=os.environ.get(TTS_CACHE_DIR_ENV, DEFAULT_TTS_CACHE_DIR))
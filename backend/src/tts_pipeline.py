@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+
+from livekit.agents import aio, tokenize
+from livekit.agents.tts import (
+    TTS,
+    StreamAdapter,
+    SynthesisEvent,
+    SynthesisEventType,
+    SynthesizedAudio,
+    SynthesizeStream,
+)
+from livekit.agents.tts.stream_adapter import (
+    StreamAdapterWrapper,
+    _SegmentEnd,
+    _SegmentStart,
+    _SynthTask,
+)
+
+
+class PlaybackStats:
+    """Estimate gaps in the played audio from the arrival of the frames.
+
+    Frames are played in real time, a segment whose first frame arrives after
+    the audio of the previous segments has finished playing is an underrun.
+    """
+
+    def __init__(self) -> None:
+        self.segments = 0
+        self.underruns = 0
+        self.total_gap = 0.0
+        self.max_gap = 0.0
+        self._play_until: float | None = None
+        self._first_frame = True
+
+    def start_segment(self) -> None:
+        self.segments += 1
+        self._first_frame = True
+
+    def on_frame(self, frame) -> None:
+        now = time.monotonic()
+        if self._play_until is None:
+            # first frame of the reply, the wait before it is time to first audio
+            self._play_until = now
+        elif self._first_frame and now > self._play_until:
+            gap = now - self._play_until
+            self.underruns += 1
+            self.total_gap += gap
+            self.max_gap = max(self.max_gap, gap)
+
+        self._first_frame = False
+        duration = frame.samples_per_channel / frame.sample_rate
+        self._play_until = max(now, self._play_until) + duration
+
+
+class LookaheadTTS(StreamAdapter):
+    """Streaming TTS on top of a non streaming one, see LookaheadStream."""
+
+    def __init__(
+        self,
+        *,
+        tts: TTS,
+        sentence_tokenizer: tokenize.SentenceTokenizer,
+        lookahead: int = 3,
+    ) -> None:
+        super().__init__(
+            tts=tts,
+            sentence_tokenizer=sentence_tokenizer,
+            max_concurrent_requests=lookahead,
+        )
+
+    def stream(self) -> SynthesizeStream:
+        return LookaheadStream(
+            tts=self._tts,
+            sentence_tokenizer=self._sentence_tokenizer,
+            lookahead=self._max_concurrent_requests,
+        )
+
+
+class LookaheadStream(StreamAdapterWrapper):
+    """The stream adapter of livekit-agents, with its synthesis bounded by playback.
+
+    The adapter already synthesizes the upcoming segments while the current one
+    plays, but only bounds the concurrent requests: the audio of a long answer
+    piles up ahead of playback, and is synthesized for nothing when the user
+    interrupts. Here at most lookahead segments are synthesized or waiting to
+    be played, a segment failing to synthesize is skipped instead of ending the
+    stream, and the gaps in the playback are measured (PlaybackStats).
+    """
+
+    def __init__(
+        self,
+        *,
+        tts: TTS,
+        sentence_tokenizer: tokenize.SentenceTokenizer,
+        lookahead: int,
+    ) -> None:
+        super().__init__(
+            tts=tts,
+            sentence_tokenizer=sentence_tokenizer,
+            max_concurrent_requests=lookahead,
+        )
+        # the background task created above only runs from the next iteration
+        self._window = asyncio.Semaphore(lookahead)
+        self._stats = PlaybackStats()
+
+    @property
+    def stats(self) -> PlaybackStats:
+        return self._stats
+
+    async def aclose(self, *, wait: bool = True) -> None:
+        # the voice assistant closes the stream from its cancelled synthesis task
+        # when the user interrupts, don't synthesize what won't be played
+        current = asyncio.current_task()
+        interrupted = current is not None and current.cancelling()
+        await super().aclose(wait=wait and not interrupted)
+
+    async def _synthesize(
+        self, sentence: str, audio_tx: aio.ChanSender[SynthesizedAudio]
+    ) -> None:
+        # the tasks are started in order and the semaphore wakes them in order,
+        # _forward releases it once the segment is played
+        await self._window.acquire()
+        try:
+            await super()._synthesize(sentence, audio_tx)
+        except Exception:
+            logging.exception("failed to synthesize %r", sentence[:40])
+
+    async def _forward(self) -> None:
+        while True:
+            item = await self._sync_q.get()
+            if item is None:
+                break
+
+            if isinstance(item, _SegmentStart):
+                self._put(SynthesisEventType.STARTED)
+            elif isinstance(item, _SegmentEnd):
+                self._put(SynthesisEventType.FINISHED)
+            elif isinstance(item, _SynthTask):
+                self._stats.start_segment()
+                try:
+                    async for audio in item.audio_rx:
+                        self._stats.on_frame(audio.data)
+                        self._put(SynthesisEventType.AUDIO, audio)
+                finally:
+                    self._window.release()
+
+    def _put(
+        self,
+        type: SynthesisEventType,
+        audio: SynthesizedAudio | None = None,
+    ) -> None:
+        self._event_q.put_nowait(SynthesisEvent(type=type, audio=audio))
+
+    async def _run(self) -> None:
+        try:
+            await super()._run()
+        finally:
+            if self._stats.segments:
+                logging.info(
+                    "tts playback: %d segments, %d underruns, gaps %.2fs (max %.2fs)",
+                    self._stats.segments,
+                    self._stats.underruns,
+                    self._stats.total_gap,
+                    self._stats.max_gap,
+                )
@@ -0,0 +1,294 @@
+import asyncio
+import base64
+import contextlib
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Literal
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.llm import ChatImage
+from PIL import Image
+
+from tracks import VideoTrackManager
+
+# the openai plugin derives the request's detail level from the inference size
+DETAIL_DIMENSIONS = {"low": 512, "high": 2048}
+
+# frames are compared on a grid of SIGNATURE_SIZE x SIGNATURE_SIZE luma averages
+SIGNATURE_SIZE = 16
+# mean luma difference (0-1, exposure removed) above which the scene changed
+SCENE_CHANGE_THRESHOLD = 0.05
+# time for a subscribed camera to deliver its track
+SUBSCRIBE_TIMEOUT = 3.0
+
+# the luma (or the only) plane comes first, its stride is the width
+_PLANAR_TYPES = (
+    rtc.VideoBufferType.I420,
+    rtc.VideoBufferType.I420A,
+    rtc.VideoBufferType.I422,
+    rtc.VideoBufferType.I444,
+    rtc.VideoBufferType.NV12,
+)
+# BT.601 luma weights of the bytes of each pixel
+_PACKED_LUMA = {
+    rtc.VideoBufferType.RGBA: np.array([0.299, 0.587, 0.114, 0], np.float32),
+    rtc.VideoBufferType.BGRA: np.array([0.114, 0.587, 0.299, 0], np.float32),
+    rtc.VideoBufferType.ARGB: np.array([0, 0.299, 0.587, 0.114], np.float32),
+    rtc.VideoBufferType.ABGR: np.array([0, 0.114, 0.587, 0.299], np.float32),
+    rtc.VideoBufferType.RGB24: np.array([0.299, 0.587, 0.114], np.float32),
+}
+
+
+@dataclass(frozen=True)
+class ImagePolicy:
+    """How a video frame is shrunk and encoded before it is sent to the LLM."""
+
+    max_edge: int = 512
+    format: Literal["JPEG", "WEBP"] = "JPEG"
+    quality: int = 75
+    detail: Literal["low", "high"] = "low"
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    format: str
+    width: int
+    height: int
+    detail: str
+
+    @property
+    def data_url(self) -> str:
+        b64 = base64.b64encode(self.data).decode("utf-8")
+        return f"data:image/{self.format.lower()};base64,{b64}"
+
+    def chat_image(self) -> ChatImage:
+        size = DETAIL_DIMENSIONS[self.detail]
+        return ChatImage(
+            image=self.data_url, inference_width=size, inference_height=size
+        )
+
+
+def encode_frame(frame: rtc.VideoFrame, policy: ImagePolicy) -> EncodedImage:
+    """Downscale and encode a frame, this is CPU bound and should run in a thread."""
+    rgba = frame
+    if frame.type != rtc.VideoBufferType.RGBA:
+        rgba = frame.convert(rtc.VideoBufferType.RGBA)
+
+    image = Image.frombytes("RGBA", (rgba.width, rgba.height), rgba.data).convert(
+        "RGB"
+    )
+    image.thumbnail((policy.max_edge, policy.max_edge))
+
+    buffer = io.BytesIO()
+    image.save(buffer, policy.format, quality=policy.quality)
+    return EncodedImage(
+        data=buffer.getvalue(),
+        format=policy.format,
+        width=image.width,
+        height=image.height,
+        detail=policy.detail,
+    )
+
+
+def luma_signature(frame: rtc.VideoFrame, size: int = SIGNATURE_SIZE) -> np.ndarray:
+    """Average luma of a size x size grid over the frame, without its mean.
+
+    Read straight from the decoded buffer, no conversion: the Y plane of YUV
+    frames, the weighted color channels of RGB ones. One pixel in 4 of each
+    row and column is plenty to average the blocks.
+    """
+    width, height = frame.width, frame.height
+    data = np.frombuffer(frame.data, dtype=np.uint8)
+    if frame.type in _PLANAR_TYPES:
+        luma = data[: width * height].reshape(height, width)[::4, ::4]
+    else:
+        weights = _PACKED_LUMA[frame.type]
+        pixels = data[: width * height * len(weights)].reshape(height, width, -1)
+        luma = pixels[::4, ::4] @ weights
+
+    rows, cols = luma.shape[0] // size, luma.shape[1] // size
+    if rows == 0 or cols == 0:
+        return np.zeros((size, size), dtype=np.float32)
+
+    blocks = luma[: rows * size, : cols * size].reshape(size, rows, size, cols)
+    grid = blocks.mean(axis=(1, 3), dtype=np.float32) / 255.0
+    # a change of exposure alone isn't a new scene
+    return grid - grid.mean()
+
+
+def scene_distance(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.abs(a - b).mean())
+
+
+def same_scene(
+    a: np.ndarray | None,
+    b: np.ndarray | None,
+    threshold: float = SCENE_CHANGE_THRESHOLD,
+) -> bool:
+    if a is None or b is None:
+        return False
+
+    return scene_distance(a, b) <= threshold
+
+
+@dataclass
+class CapturedFrame:
+    frame: rtc.VideoFrame
+    captured_at: float  # time.monotonic() when the frame was received
+    # see luma_signature(), None until computed
+    signature: np.ndarray | None = field(default=None, repr=False)
+    _encoded: Dict[ImagePolicy, EncodedImage] = field(
+        default_factory=dict, repr=False, init=False
+    )
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.captured_at
+
+    async def encode(self, policy: ImagePolicy) -> EncodedImage:
+        """Encode the frame off the event loop, once per policy."""
+        if policy not in self._encoded:
+            self._encoded[policy] = await asyncio.to_thread(
+                encode_frame, self.frame, policy
+            )
+
+        return self._encoded[policy]
+
+
+class FrameGrabber:
+    """Grab frames from a video track only when they are needed.
+
+    Frames are only pulled into Python while a capture is running: on request,
+    or every sample_interval seconds when set. The track is set by a
+    VideoTrackManager, given as video to subscribe it on demand. Every
+    captured frame gets its luma signature, compared with the previous one: a
+    scene change calls the on_scene_change listeners.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_interval: float | None = None,
+        capture_timeout: float = 2.0,
+        scene_threshold: float = SCENE_CHANGE_THRESHOLD,
+        video: VideoTrackManager | None = None,
+    ) -> None:
+        self._sample_interval = sample_interval
+        self._capture_timeout = capture_timeout
+        self._scene_threshold = scene_threshold
+        self._scene_listeners: List[Callable[[CapturedFrame], None]] = []
+        self.scene_changes = 0
+        self._video = video
+        self._track_set = asyncio.Event()
+        self._track: rtc.RemoteVideoTrack | None = None
+        self._latest: CapturedFrame | None = None
+        self._pending: asyncio.Future[CapturedFrame | None] | None = None
+        self._sample_task: asyncio.Task | None = None
+
+    @property
+    def latest(self) -> CapturedFrame | None:
+        return self._latest
+
+    def on_scene_change(self, listener: Callable[[CapturedFrame], None]) -> None:
+        self._scene_listeners.append(listener)
+
+    def same_scene(self, a: np.ndarray | None, b: np.ndarray | None) -> bool:
+        return same_scene(a, b, self._scene_threshold)
+
+    def set_track(self, track: rtc.RemoteVideoTrack | None) -> None:
+        if track is self._track:
+            return
+
+        self._track = track
+        self._latest = None
+        if track is None:
+            self._track_set.clear()
+        else:
+            self._track_set.set()
+        if self._sample_task is not None:
+            self._sample_task.cancel()
+            self._sample_task = None
+
+        if track is not None and self._sample_interval:
+            self._sample_task = asyncio.create_task(self._sample(track))
+
+    async def capture(self, max_age: float | None = None) -> CapturedFrame | None:
+        """Return a frame at most max_age seconds old, grabbing a new one if needed.
+
+        max_age defaults to the sample interval (0 when sampling is disabled).
+        """
+        if max_age is None:
+            max_age = self._sample_interval or 0.0
+
+        if self._latest is not None and self._latest.age <= max_age:
+            return self._latest
+
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._grab())
+            self._pending.add_done_callback(self._clear_pending)
+
+        return await asyncio.shield(self._pending)
+
+    async def aclose(self) -> None:
+        self.set_track(None)
+        if self._pending is not None:
+            with contextlib.suppress(Exception):
+                await self._pending
+
+    def _clear_pending(self, _: asyncio.Future) -> None:
+        self._pending = None
+
+    async def _grab(self) -> CapturedFrame | None:
+        if self._video is None:
+            return await self._grab_track()
+
+        available = self._video.acquire()
+        try:
+            if self._track is None and available:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._track_set.wait(), SUBSCRIBE_TIMEOUT)
+            return await self._grab_track()
+        finally:
+            self._video.release()
+
+    async def _grab_track(self) -> CapturedFrame | None:
+        track = self._track
+        if track is None:
+            return self._latest
+
+        # capacity=1, only the newest decoded frame is kept while we wait
+        stream = rtc.VideoStream(track, capacity=1)
+        try:
+            event = await asyncio.wait_for(
+                stream.__anext__(), timeout=self._capture_timeout
+            )
+        except (asyncio.TimeoutError, StopAsyncIteration):
+            logging.warning("no video frame received from track %s", track.sid)
+            return self._latest
+        finally:
+            await stream.aclose()
+
+        captured = CapturedFrame(frame=event.frame, captured_at=time.monotonic())
+        captured.signature = await asyncio.to_thread(luma_signature, event.frame)
+        if self._track is not track:
+            return self._latest
+
+        previous, self._latest = self._latest, captured
+        if previous is not None and not self.same_scene(
+            previous.signature, captured.signature
+        ):
+            self.scene_changes += 1
+            for listener in self._scene_listeners:
+                listener(captured)
+
+        return self._latest
+
+    async def _sample(self, track: rtc.RemoteVideoTrack) -> None:
+        while self._track is track:
+            with contextlib.suppress(Exception):
+                await self.capture(max_age=0)
+            await asyncio.sleep(self._sample_interval)
@@ -0,0 +1,430 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+from collections import Counter, deque
+from typing import Dict
+
+from livekit import agents, rtc
+from livekit.agents import (
+    AutoSubscribe,
+    JobContext,
+    JobRequest,
+    WorkerOptions,
+    cli,
+    stt,
+)
+from livekit.agents.llm import (
+    ChatMessage,
+    ChatRole,
+)
+from livekit.agents.voice_assistant import AssistantContext, VoiceAssistant
+from livekit.plugins import deepgram, openai
+from dotenv import load_dotenv
+
+import admission
+import audio_cache
+import connections
+import knowledge
+import logging_config
+import metrics
+import models
+import prerender_audio
+import prompt_cache
+import tts_cache
+from answer_cache import AnswerCacheLLM, expire_answers
+from context_window import (
+    BudgetedLLM,
+    ContextWindow,
+    SnapshotChatContext,
+    replace_message,
+)
+from endpointing import AdaptiveVAD, Endpointer
+from knowledge import KnowledgeLLM
+from metrics import TimedLLM, TimedTTS, TurnTimeline
+from persona import Persona, build_fnc_ctx, persona_from_metadata
+from persona import registry as persona_registry
+from segmenter import ClauseTokenizer
+from speculation import ObservedSTT, SpeculativeLLM
+from tts_pipeline import LookaheadTTS
+from tracks import VideoTrackManager
+from vision import CapturedFrame, FrameGrabber
+
+load_dotenv()
+
+MAX_IMAGES = 3
+# sent instead of a new image when the camera still shows the last one
+SAME_SCENE_NOTE = "(The camera still shows the scene of the last image.)"
+
+# name of the persona used when neither the job nor the room asks for one
+DEFAULT_PERSONA_ENV = "AGENT_PERSONA"
+
+# recomputes what is derived from reloaded personas, off the worker's loop
+_derived_executor: concurrent.futures.ThreadPoolExecutor | None = None
+
+
+def get_personas() -> Dict[str, Persona]:
+    return persona_registry.personas
+
+
+def _refresh_derived(persona: Persona, previous: Persona | None) -> None:
+    # sessions started meanwhile count the tokens and synthesize the phrases themselves
+    try:
+        prompt_cache.check_prefixes({persona.name: persona})
+        expire_answers({persona.name: persona})
+        if (
+            previous is None
+            or previous.voice != persona.voice
+            or prerender_audio.static_phrases(previous)
+            != prerender_audio.static_phrases(persona)
+        ):
+            asyncio.run(prerender_audio.prerender(audio_cache.cache, False, [persona]))
+    except Exception:
+        logging.exception("failed to refresh the derived data of %s", persona.name)
+
+
+def _on_persona_change(persona: Persona) -> None:
+    admission.controller.add_persona(persona.name)
+    knowledge.index_for(persona)
+    metrics.add_persona(persona.name)
+    # the registry still holds the previous version while its listeners run
+    previous = get_personas().get(persona.name)
+    _derived_executor.submit(_refresh_derived, persona, previous)
+
+
+async def entrypoint(persona: Persona, ctx: JobContext):
+    logging_config.setup_job_logging(
+        room=ctx.room.name, session=ctx.id, persona=persona.name, turn=0
+    )
+    logging.info("starting persona %s in room %s", persona.name, ctx.room.name)
+    session_slot = admission.controller.register(ctx.id, persona.name)
+    pool = connections.pool
+    pool.start(persona.name)
+    sip = ctx.room.name.startswith("sip")
+    vision = persona.vision and not sip
+    initial_ctx = SnapshotChatContext(
+        messages=[
+            ChatMessage(
+                role=ChatRole.SYSTEM,
+                text=persona.system_prompt,
+            )
+        ]
+    )
+
+    window = ContextWindow(initial_ctx, max_tokens=persona.max_context_tokens)
+    fnc_ctx = build_fnc_ctx(persona) if vision else None
+    prompt_client = prompt_cache.PromptCacheClient(
+        persona.name,
+        prompt_cache.PromptPrefix.build(persona.system_prompt, fnc_ctx),
+        model=persona.llm_model,
+        http_client=pool.llm_http_client(),
+    )
+    openai_llm = openai.LLM(
+        model=persona.llm_model,
+        client=prompt_client,
+    )
+    gpt = BudgetedLLM(openai_llm, window, label=persona.name)
+    retrieval = None
+    knowledge_index = knowledge.index_for(persona)
+    if knowledge_index is not None:
+        retrieval = KnowledgeLLM(
+            gpt, knowledge_index, passages=persona.knowledge_passages
+        )
+        gpt = retrieval
+    openai_tts = LookaheadTTS(
+        tts=audio_cache.CachedTTS(
+            tts_cache.CachingTTS(
+                openai.TTS(voice=persona.voice, http_session=pool.tts_session()),
+                voice=persona.voice,
+                cache=tts_cache.cache,
+            ),
+            voice=persona.voice,
+            cache=audio_cache.cache,
+        ),
+        sentence_tokenizer=ClauseTokenizer(language=persona.language),
+    )
+    stt_options = {"model": persona.stt_model, "http_session": pool.stt_session()}
+    if persona.stt_language:
+        stt_options["language"] = persona.stt_language
+
+    timeline = TurnTimeline(persona.name, metrics.histograms)
+    endpointer = Endpointer(persona.endpointing, language=persona.language)
+    assistant_llm = gpt
+    speculative = None
+    if persona.speculative_llm:
+        speculative = SpeculativeLLM(
+            gpt, chat_ctx=initial_ctx, fnc_ctx=fnc_ctx, window=window
+        )
+        assistant_llm = speculative
+    answers = None
+    if persona.answer_cache:
+        answers = AnswerCacheLLM(assistant_llm, persona)
+        assistant_llm = answers
+
+    def _on_speech_event(event: stt.SpeechEvent):
+        if event.alternatives and event.type in (
+            stt.SpeechEventType.INTERIM_TRANSCRIPT,
+            stt.SpeechEventType.FINAL_TRANSCRIPT,
+        ):
+            endpointer.on_transcript(event.alternatives[0].text)
+        if event.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+            timeline.mark("stt_final")
+        if speculative is not None:
+            speculative.on_speech_event(event)
+
+    video = None
+    if vision:
+        video = VideoTrackManager(
+            ctx.room, on_demand=not subscribes_video(persona, ctx.room.name)
+        )
+    grabber = FrameGrabber(sample_interval=persona.frame_sample_interval, video=video)
+    img_msg_queue: deque[agents.llm.ChatMessage] = deque()
+    # the last image message and the frame it was encoded from
+    last_image: tuple[ChatMessage, CapturedFrame] | None = None
+    vision_stats: Counter = Counter()
+
+    def _on_scene_change(captured: CapturedFrame):
+        logging.debug("scene changed (frame captured %.2fs ago)", captured.age)
+
+    grabber.on_scene_change(_on_scene_change)
+    assistant = VoiceAssistant(
+        vad=AdaptiveVAD(models.registry.vad(), endpointer),
+        stt=ObservedSTT(deepgram.STT(**stt_options), _on_speech_event),
+        llm=TimedLLM(assistant_llm, timeline),
+        tts=TimedTTS(openai_tts, timeline),
+        fnc_ctx=fnc_ctx,
+        chat_ctx=initial_ctx,
+    )
+
+    chat = rtc.ChatManager(ctx.room)
+
+    async def _answer_from_text(text: str):
+        chat_ctx = assistant.chat_context.copy()
+        chat_ctx.messages.append(ChatMessage(role=ChatRole.USER, text=text))
+
+        stream = await gpt.chat(chat_ctx)
+        await assistant.say(stream)
+
+    @chat.on("message_received")
+    def on_chat_received(msg: rtc.ChatMessage):
+        if not msg.message:
+            return
+
+        asyncio.create_task(_answer_from_text(msg.message))
+
+    async def _append_image(user_msg: str, captured: CapturedFrame):
+        nonlocal last_image
+        vision_stats["sent"] += 1
+        image = await captured.encode(persona.image_policy)
+        logging.debug(
+            "answering with a %dx%d frame (%d bytes) captured %.2fs ago",
+            image.width,
+            image.height,
+            len(image.data),
+            captured.age,
+        )
+        initial_ctx.messages.append(
+            agents.llm.ChatMessage(
+                role=agents.llm.ChatRole.USER,
+                text=user_msg,
+                images=[image.chat_image()],
+            )
+        )
+        img_msg_queue.append(initial_ctx.messages[-1])
+        last_image = (initial_ctx.messages[-1], captured)
+        if len(img_msg_queue) >= MAX_IMAGES:
+            msg = img_msg_queue.popleft()
+            text_only = ChatMessage(role=msg.role, text=msg.text)
+            replace_message(initial_ctx, msg, text_only)
+
+    async def respond_to_image(user_msg: str):
+        captured = await grabber.capture()
+        if captured is None:
+            await assistant.say(persona.no_image_message)
+            return
+
+        # the image already in the context still shows what the user asks about
+        if (
+            last_image is not None
+            and any(m is last_image[0] for m in initial_ctx.messages)
+            and grabber.same_scene(last_image[1].signature, captured.signature)
+        ):
+            vision_stats["reused"] += 1
+            logging.debug("same scene as the last image, not sending a new one")
+            initial_ctx.messages.append(
+                ChatMessage(role=ChatRole.USER, text=f"{user_msg}\n{SAME_SCENE_NOTE}")
+            )
+        else:
+            await _append_image(user_msg, captured)
+
+        stream = await gpt.chat(initial_ctx.copy())
+        await assistant.say(stream, allow_interruptions=True)
+
+    def _maintain_context(*_):
+        window.fit()
+        if persona.compact_context:
+            asyncio.ensure_future(window.compact(openai_llm))
+
+    turns = 0
+
+    @assistant.on("user_speech_committed")
+    def _user_turn_done(*_):
+        nonlocal turns
+        turns += 1
+        logging_config.update(turn=turns)
+        window.fit()
+        if speculative is not None:
+            speculative.reset()
+
+    assistant.on("user_started_speaking", timeline.on_user_started_speaking)
+    assistant.on("user_stopped_speaking", timeline.on_user_stopped_speaking)
+    assistant.on("agent_started_speaking", timeline.on_agent_started_speaking)
+    assistant.on("agent_stopped_speaking", timeline.on_agent_stopped_speaking)
+    assistant.on("agent_speech_committed", _maintain_context)
+    assistant.on("agent_speech_interrupted", _maintain_context)
+
+    @assistant.on("function_calls_finished")
+    def _function_calls_done(ctx: AssistantContext):
+        user_msg = ctx.get_metadata("user_msg")
+        if not user_msg:
+            return
+        asyncio.ensure_future(respond_to_image(user_msg))
+
+    disconnected = asyncio.Event()
+
+    @ctx.room.on("disconnected")
+    def _log_session_stats(*_):
+        disconnected.set()
+        admission.controller.release(session_slot)
+        logging.info("tts cache: %s", tts_cache.cache.stats())
+        logging.info("prompt cache: %s", prompt_client.stats.as_dict())
+        logging.info("connections: %s", pool.stats())
+        if speculative is not None:
+            logging.info("speculation: %s", speculative.stats())
+        if answers is not None:
+            logging.info("answer cache: %s", answers.stats())
+        if video is not None:
+            logging.info(
+                "vision: %s",
+                {
+                    **vision_stats,
+                    "scene_changes": grabber.scene_changes,
+                    **video.stats(),
+                },
+            )
+            video.close()
+        if retrieval is not None:
+            logging.info("knowledge: %s", retrieval.stats.as_dict())
+        logging.info(
+            "endpointing: delay %.2fs, %d cut-offs", endpointer.delay, endpointer.cutoffs
+        )
+
+    assistant.start(ctx.room)
+    if video is not None:
+        # hands the grabber the track to use, as cameras come and go
+        video.start(grabber.set_track)
+
+    try:
+        await asyncio.sleep(0.5)
+        await assistant.say(persona.greeting, allow_interruptions=True)
+        # the job process awaits the entrypoint once it left the room, before exiting
+        await disconnected.wait()
+    finally:
+        for closing in (grabber.aclose(), pool.aclose()):
+            try:
+                await closing
+            except Exception:
+                logging.exception("failed to close the session")
+
+
+def subscribes_video(persona: Persona, room_name: str) -> bool:
+    """Whether the session receives the camera from the start.
+
+    Only for personas sampling frames in the background: the others subscribe
+    it while they grab a frame (VideoTrackManager), SIP calls have none.
+    """
+    sip = room_name.startswith("sip")
+    return persona.vision and not sip and persona.frame_sample_interval is not None
+
+
+def select_persona(req: JobRequest) -> Persona | None:
+    """Pick the persona for a job: job metadata, then room metadata, then the default."""
+    personas = get_personas()
+    name = persona_from_metadata(req.job.metadata, req.room.metadata)
+    if name is None:
+        name = os.environ.get(DEFAULT_PERSONA_ENV)
+
+    if name not in personas:
+        logging.warning("unknown persona %r for room %s", name, req.room.name)
+        return None
+
+    return personas[name]
+
+
+async def request_fnc(req: JobRequest) -> None:
+    logging.info("received request %s", req)
+    persona = select_persona(req)
+    if persona is None:
+        await req.reject()
+        return
+
+    reason = admission.controller.check(persona.name, persona.max_sessions)
+    if reason is not None:
+        # another worker gets the job
+        logging.warning(
+            "rejecting job %s for %s: %s (rejections %s)",
+            req.id,
+            persona.name,
+            reason,
+            dict(admission.controller.rejections),
+        )
+        await req.reject()
+        return
+
+    admission.controller.admit(req.id, persona.name)
+    auto_subscribe = AutoSubscribe.AUDIO_ONLY
+    if subscribes_video(persona, req.room.name):
+        auto_subscribe = AutoSubscribe.SUBSCRIBE_ALL
+    await req.accept(
+        functools.partial(entrypoint, persona), auto_subscribe=auto_subscribe
+    )
+
+
+def run(default_persona: str | None = None) -> None:
+    """Run a worker able to serve every persona.
+
+    default_persona is used for jobs that don't name a persona in their metadata,
+    it can also be set with the AGENT_PERSONA environment variable.
+    """
+    if default_persona:
+        os.environ.setdefault(DEFAULT_PERSONA_ENV, default_persona)
+
+    # load every persona and local model before the job processes are forked from this one
+    admission.setup(list(get_personas()))
+    metrics.setup(list(get_personas()))
+    prompt_cache.check_prefixes(get_personas())
+    expire_answers(get_personas())
+    for persona in get_personas().values():
+        knowledge.index_for(persona)
+    global _derived_executor
+    _derived_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    persona_registry.on_change(_on_persona_change)
+    persona_registry.watch()
+    metrics.serve()
+    models.registry.load()
+    audio_cache.cache.load()
+    cli.run_app(
+        WorkerOptions(
+            request_fnc,
+            load_fnc=admission.load,
+            # admission rejects before the cpu alone makes the worker unavailable
+            load_threshold=1.0,
+        )
+    )
+
+
+if __name__ == "__main__":
+    logging_config.setup_logging()
+    logging.info("Multi-persona worker started")
+    run()
@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing as mp
+import time
+
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionLimits
+
+
+@pytest.fixture
+def controller():
+    return AdmissionController(["summit", "poker"], AdmissionLimits(max_sessions=3))
+
+
+def test_sessions_count_registered_and_pending_jobs(controller):
+    controller.register("job-1", "summit")
+    controller.admit("job-2", "poker")
+    controller.admit("job-1", "summit")
+
+    assert controller.sessions() == {"summit": 1, "poker": 1}
+
+
+def test_pending_jobs_expire(controller, monkeypatch):
+    controller.admit("job-1", "summit")
+    monkeypatch.setattr(admission, "PENDING_TTL", -1.0)
+
+    assert sum(controller.sessions().values()) == 0
+
+
+def test_released_and_dead_slots_free_their_session(controller):
+    slot = controller.register("job-1", "summit")
+    controller.release(slot)
+
+    context = mp.get_context("fork")
+    process = context.Process(target=controller.register, args=("job-2", "poker"))
+    process.start()
+    process.join()
+
+    assert sum(controller.sessions().values()) == 0
+
+
+def test_rejects_at_the_session_limits(controller):
+    controller.cpu = 0.0
+    controller._monitor = object()
+    controller.register("job-1", "summit")
+    controller.register("job-2", "summit")
+
+    assert controller.check("summit", max_sessions=2) == "summit at 2 sessions"
+    assert controller.check("poker", max_sessions=2) is None
+    controller.register("job-3", "poker")
+    assert controller.check("poker") == "worker at 3 sessions"
+    assert controller.rejections == {"persona_sessions": 1, "sessions": 1}
+
+
+def test_rejects_on_cpu_and_loop_lag(controller):
+    controller._monitor = object()
+    controller.cpu = 0.9
+    assert controller.check("summit") == "cpu at 90%"
+
+    controller.cpu = 0.1
+    controller.loop_lag = 0.3
+    assert controller.check("summit").startswith("event loop lagging")
+    assert controller.load() == pytest.approx(0.3 / 0.25)
+
+
+def test_jobs_report_the_lag_of_their_loop(controller, monkeypatch):
+    monkeypatch.setattr(admission, "MONITOR_INTERVAL", 0.05)
+
+    async def session():
+        slot = controller.register("job-1", "summit")
+        await asyncio.sleep(0.01)
+        # audio work blocking the job's loop
+        time.sleep(0.3)
+        await asyncio.sleep(0.1)
+        lag = controller.jobs_loop_lag()
+        controller.release(slot)
+        return lag
+
+    assert asyncio.run(session()) >= 0.2
+
+
+def test_a_stalled_job_counts_as_lagging(controller, monkeypatch):
+    monkeypatch.setattr(admission, "MONITOR_INTERVAL", 0.05)
+    slot = controller.register("job-1", "summit")
+    assert controller.jobs_loop_lag() < 0.05
+
+    controller._slots[slot].beat = time.monotonic() - 1.0
+    assert controller.jobs_loop_lag() > 0.9
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import sqlite3
+
+import pytest
+from livekit.agents import llm
+from livekit.agents.llm import ChatContext, ChatMessage, ChatRole
+
+from answer_cache import AnswerCacheLLM, AnswerStore, persona_fingerprint
+from persona import Persona
+
+PERSONA = Persona(
+    name="guide",
+    language="fr",
+    system_prompt="Tu es le guide du festival.",
+    greeting="Bonjour !",
+    no_image_message="",
+    image_fnc_desc="",
+    user_msg_desc="",
+    answer_cache=True,
+)
+
+
+class CountingLLM(llm.LLM):
+    """Answers "réponse <n>", n counting the requests."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+
+    async def chat(self, history, fnc_ctx=None, temperature=None, n=1):
+        self.requests += 1
+        return AnswerStream(f"réponse {self.requests}")
+
+
+class AnswerStream(llm.LLMStream):
+    def __init__(self, answer: str) -> None:
+        super().__init__()
+        self._chunks = [answer[: len(answer) // 2], answer[len(answer) // 2 :]]
+
+    def __aiter__(self) -> "AnswerStream":
+        return self
+
+    async def __anext__(self) -> llm.ChatChunk:
+        if not self._chunks:
+            raise StopAsyncIteration
+        delta = llm.ChoiceDelta(role=ChatRole.ASSISTANT, content=self._chunks.pop(0))
+        return llm.ChatChunk(choices=[llm.Choice(delta=delta)])
+
+    async def aclose(self, wait: bool = True) -> None:
+        pass
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AnswerStore(tmp_path / "answers.db")
+    yield store
+    store.close()
+
+
+async def session(cache: AnswerCacheLLM, *questions: str) -> list:
+    """Ask the questions in turn, returns the answers."""
+    history = ChatContext(
+        messages=[
+            ChatMessage(role=ChatRole.SYSTEM, text=PERSONA.system_prompt),
+            ChatMessage(role=ChatRole.ASSISTANT, text=PERSONA.greeting),
+        ]
+    )
+    answers = []
+    for question in questions:
+        history.messages.append(ChatMessage(role=ChatRole.USER, text=question))
+        stream = await cache.chat(history)
+        answer = "".join([c.choices[0].delta.content async for c in stream])
+        history.messages.append(ChatMessage(role=ChatRole.ASSISTANT, text=answer))
+        answers.append(answer)
+        # the answers are recorded in the background
+        await asyncio.gather(*cache._tasks, return_exceptions=True)
+    return answers
+
+
+def test_answered_from_the_cache_once_seen_twice(store):
+    inner = CountingLLM()
+    cache = AnswerCacheLLM(inner, PERSONA, store=store)
+
+    async def run():
+        first = await session(cache, "À quelle heure ouvre le festival ?")
+        second = await session(cache, "À quelle heure ouvre le festival ?")
+        third = await session(cache, "à quelle heure ouvre le festival")
+        return first + second + third
+
+    assert asyncio.run(run()) == ["réponse 1", "réponse 2", "réponse 2"]
+    assert inner.requests == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "recorded": 2}
+
+
+def test_different_question_goes_to_the_llm(store):
+    inner = CountingLLM()
+    cache = AnswerCacheLLM(inner, PERSONA, store=store)
+
+    async def run():
+        for _ in range(2):
+            await session(cache, "À quelle heure ouvre le festival ?")
+        return await session(cache, "À quelle heure ferme le parking ?")
+
+    assert asyncio.run(run()) == ["réponse 3"]
+
+
+def test_follow_up_only_matches_after_the_same_question(store):
+    inner = CountingLLM()
+    cache = AnswerCacheLLM(inner, PERSONA, store=store)
+    follow_up = "Combien coûte le billet pour deux personnes ?"
+
+    async def run():
+        for _ in range(2):
+            await session(cache, "Parlez-moi du pass VIP", follow_up)
+        after_parking = await session(cache, "Parlez-moi du parking", follow_up)
+        after_vip = await session(cache, "Parlez-moi du pass VIP", follow_up)
+        return after_parking, after_vip
+
+    after_parking, after_vip = asyncio.run(run())
+    assert after_parking == ["réponse 5", "réponse 6"]
+    assert after_vip == ["réponse 3", "réponse 4"]
+
+
+def test_no_cache_after_a_question_without_terms(store):
+    inner = CountingLLM()
+    cache = AnswerCacheLLM(inner, PERSONA, store=store)
+
+    async def run():
+        for _ in range(3):
+            await session(cache, "Oui", "À quelle heure ouvre le festival ?")
+
+    asyncio.run(run())
+    assert inner.requests == 6
+    assert cache.stats() == {}
+
+
+def test_same_question_after_the_same_one_adds_to_the_same_row(store):
+    for _ in range(3):
+        store.record("guide", "a", "fr", "Le prix ?", "Dix euros.", None, "Le pass VIP")
+    store.record("guide", "a", "fr", "Le prix ?", "Cinq euros.", None, "Le parking")
+
+    entries = sorted(store.load("guide", "a", "fr"), key=lambda e: e.seen)
+    assert [(e.answer, e.seen) for e in entries] == [
+        ("Cinq euros.", 1),
+        ("Dix euros.", 3),
+    ]
+
+
+def test_answers_of_other_definitions_expire(store):
+    store.record("guide", "old", "fr", "Le prix du pass ?", "Dix euros.", None)
+    store.record("guide", "new", "fr", "Le prix du pass ?", "Douze euros.", None)
+    store.record("autre", "old", "fr", "Le prix du pass ?", "Cinq euros.", None)
+
+    assert [e.answer for e in store.load("guide", "new", "fr")] == ["Douze euros."]
+    assert store.expire("guide", "new") == 1
+    assert store.load("guide", "old", "fr") == []
+    assert [e.answer for e in store.load("autre", "old", "fr")] == ["Cinq euros."]
+
+
+def test_store_is_shared_by_threads(store):
+    fingerprint = persona_fingerprint(PERSONA)
+
+    async def run():
+        await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    store.record, "guide", fingerprint, "fr", "Le prix ?", "Dix.", None
+                )
+                for _ in range(32)
+            )
+        )
+
+    asyncio.run(run())
+    assert [e.seen for e in store.load("guide", fingerprint, "fr")] == [32]
+
+
+def test_failed_updates_are_logged(store, caplog):
+    def served(entry_id: int) -> None:
+        raise sqlite3.OperationalError("database is locked")
+
+    store.served = served
+    cache = AnswerCacheLLM(CountingLLM(), PERSONA, store=store)
+
+    async def run():
+        for _ in range(3):
+            await session(cache, "À quelle heure ouvre le festival ?")
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(run())
+    assert "failed to update the answer cache" in caplog.text
+    assert not cache._tasks
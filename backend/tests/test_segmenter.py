@@ -0,0 +1,61 @@
+from segmenter import ClauseSegmenter
+
+
+def segment(text: str, **options) -> list:
+    segmenter = ClauseSegmenter(**options)
+    return segmenter.push(text) + segmenter.flush()
+
+
+def test_first_chunk_is_cut_at_the_first_clause():
+    assert segment(
+        "Bonjour et bienvenue au sommet, je suis votre assistante pour la journée.",
+        language="fr",
+    ) == [
+        "Bonjour et bienvenue au sommet,",
+        "je suis votre assistante pour la journée.",
+    ]
+
+
+def test_later_chunks_need_more_text_before_a_clause_boundary():
+    chunks = segment(
+        "Oui, bien sûr. La salle A, au premier étage, accueille la plénière, "
+        "la salle B les ateliers, et la salle C le déjeuner.",
+        language="fr",
+    )
+    assert chunks == [
+        "Oui, bien sûr. La salle A,",
+        "au premier étage, accueille la plénière,",
+        "la salle B les ateliers, et la salle C le déjeuner.",
+    ]
+
+
+def test_abbreviations_and_initials_dont_end_sentences():
+    assert segment(
+        "Le Dr. Martin et J. Dupont vous attendent. Venez vite !", language="fr"
+    ) == ["Le Dr. Martin et J. Dupont vous attendent.", "Venez vite !"]
+
+
+def test_numbered_list_items_stay_with_their_text():
+    assert segment("1. Appelez-nous demain matin. 2. Envoyez le dossier.") == [
+        "1. Appelez-nous demain matin.",
+        "2. Envoyez le dossier.",
+    ]
+
+
+def test_numbered_list_items_within_a_sentence_are_not_boundaries():
+    chunks = segment(
+        "Voici le programme des ateliers : 1. Innovation 2. Leadership. "
+        "Inscrivez-vous à l'accueil.",
+        language="fr",
+        first_min_len=40,
+    )
+    assert chunks == [
+        "Voici le programme des ateliers : 1. Innovation 2. Leadership.",
+        "Inscrivez-vous à l'accueil.",
+    ]
+
+
+def test_long_text_is_not_cut_between_the_groups_of_a_number():
+    chunks = segment("mot " * 68 + "et 1 000 000 euros", max_len=280)
+    assert chunks[-1] == "1 000 000 euros"
+    assert all(len(c) <= 280 for c in chunks)
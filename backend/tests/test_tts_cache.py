@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+from audio_cache import phrase_key
+from tts_cache import LOCK_STRIPES, TTSCache
+
+
+def key(text: str) -> str:
+    return phrase_key(text, "alloy", 24000)
+
+
+def test_memory_is_bounded_least_recently_used_first():
+    cache = TTSCache(max_bytes=30)
+
+    async def run():
+        await cache.put(key("a"), b"a" * 10)
+        await cache.put(key("b"), b"b" * 10)
+        await cache.put(key("c"), b"c" * 10)
+        assert await cache.get(key("a")) == b"a" * 10
+        await cache.put(key("d"), b"d" * 10)
+        return [await cache.get(key(t)) is not None for t in "abcd"]
+
+    assert asyncio.run(run()) == [True, False, True, True]
+    assert cache.stats()["bytes"] == 30
+
+
+def test_spilled_phrases_are_shared_by_the_processes(tmp_path):
+    writer = TTSCache(spill_dir=tmp_path)
+    reader = TTSCache(spill_dir=tmp_path)
+
+    async def run():
+        await writer.put(key("bonjour"), b"pcm")
+        return await reader.get(key("bonjour")), await reader.get(key("absent"))
+
+    assert asyncio.run(run()) == (b"pcm", None)
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_disk_is_bounded_oldest_first(tmp_path):
+    cache = TTSCache(spill_dir=tmp_path, max_disk_bytes=25)
+
+    async def run():
+        for i, text in enumerate("abc"):
+            await cache.put(key(text), bytes(10))
+            os.utime(tmp_path / f"{key(text)}.pcm", (i, i))
+
+    asyncio.run(run())
+    cache._evict_spilled()
+    assert sorted(p.name for p in tmp_path.glob("*.pcm")) == sorted(
+        [f"{key('b')}.pcm", f"{key('c')}.pcm"]
+    )
+
+
+def test_lock_files_are_reused(tmp_path):
+    cache = TTSCache(spill_dir=tmp_path)
+
+    async def run():
+        for i in range(2 * LOCK_STRIPES):
+            async with cache.synthesis_lock(key(str(i))):
+                pass
+
+    asyncio.run(run())
+    assert len(list((tmp_path / "locks").iterdir())) <= LOCK_STRIPES
+    assert not list(tmp_path.glob("*.lock"))
@@ -0,0 +1,88 @@
+import asyncio
+
+from livekit import rtc
+from livekit.agents import tts
+
+from segmenter import ClauseTokenizer
+from tts_pipeline import LookaheadTTS
+
+
+class SlowTTS(tts.TTS):
+    """Two 10ms frames per segment, after a delay, failing on "boom"."""
+
+    def __init__(self) -> None:
+        super().__init__(streaming_supported=False, sample_rate=16000, num_channels=1)
+        self.active = 0
+        self.max_active = 0
+        self.texts = []
+
+    def synthesize(self, text: str) -> tts.ChunkedStream:
+        return SlowStream(self, text)
+
+
+class SlowStream(tts.ChunkedStream):
+    def __init__(self, engine: SlowTTS, text: str) -> None:
+        self._engine = engine
+        self._text = text
+        self._frames = None
+
+    async def __anext__(self) -> tts.SynthesizedAudio:
+        if self._frames is None:
+            self._engine.active += 1
+            self._engine.max_active = max(self._engine.max_active, self._engine.active)
+            self._engine.texts.append(self._text)
+            try:
+                await asyncio.sleep(0.01)
+            finally:
+                self._engine.active -= 1
+            if "boom" in self._text:
+                raise RuntimeError("synthesis failed")
+            self._frames = [rtc.AudioFrame(bytes(320), 16000, 1, 160)] * 2
+
+        if not self._frames:
+            raise StopAsyncIteration
+        return tts.SynthesizedAudio(text=self._text, data=self._frames.pop())
+
+    async def aclose(self) -> None:
+        pass
+
+
+SENTENCES = [f"Phrase numéro {i} de la réponse, assez longue." for i in range(8)]
+
+
+async def synthesize(engine: SlowTTS, sentences, lookahead: int = 2) -> list:
+    stream = LookaheadTTS(
+        tts=engine, sentence_tokenizer=ClauseTokenizer(), lookahead=lookahead
+    ).stream()
+    stream.push_text(" ".join(sentences))
+    stream.mark_segment_end()
+    events = []
+    async for event in stream:
+        events.append(event)
+        if event.type == tts.SynthesisEventType.FINISHED:
+            break
+    await stream.aclose()
+    return events
+
+
+def test_segments_are_played_in_order_within_the_lookahead():
+    engine = SlowTTS()
+    events = asyncio.run(synthesize(engine, SENTENCES))
+
+    audio = [e.audio.text for e in events if e.type == tts.SynthesisEventType.AUDIO]
+    assert len(engine.texts) > 2
+    assert " ".join(engine.texts) == " ".join(SENTENCES)
+    assert audio == [t for t in engine.texts for _ in range(2)]
+    assert events[0].type == tts.SynthesisEventType.STARTED
+    assert engine.max_active <= 2
+
+
+def test_a_failed_segment_is_skipped():
+    engine = SlowTTS()
+    sentences = [SENTENCES[0], "Et là, boom, plus rien du tout.", SENTENCES[1]]
+    events = asyncio.run(synthesize(engine, sentences))
+
+    audio = [e.audio.text for e in events if e.type == tts.SynthesisEventType.AUDIO]
+    played = [t for t in engine.texts if "boom" not in t]
+    assert len(played) < len(engine.texts)
+    assert audio == [t for t in played for _ in range(2)]